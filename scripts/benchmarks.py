@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""Benchmark the hot paths of the content import scripts and compare runs against a baseline.
+
+Every case runs on synthetic input generated in a temporary directory, so
+no network access or blog content is needed. Results are written as JSON,
+and compared with a saved baseline to catch regressions.
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import importlib.util
+import io
+import json
+import pathlib
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import feedparser
+
+from books import sync as book_sync
+from books.book import Book
+from books.shelves import FAVORITES
+from posts import cli as posts_cli
+from posts.fetch_medium import parse_medium_entry
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+BENCHMARK_DIR = ROOT_DIR / ".cache" / "benchmarks"
+DEFAULT_OUTPUT = BENCHMARK_DIR / "latest.json"
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_BOOK_COUNTS = [100, 1000, 10000]
+# Every DUPLICATE_EVERY-th synthetic book also has a second file with the same book_id
+DUPLICATE_EVERY = 20
+THROUGHPUT_ITEMS = 100000
+MEDIUM_ARTICLES = 10
+MEDIUM_SECTIONS = 400
+PDF_PAGES = 20
+
+WORDS = ["the", "quiet", "Architecture", "of", "Distributed", "Systems", "café", "naïve",
+         "C++", "&", "Rust:", "lessons", "learned", "(2nd", "Edition)", "—", "why", "it's", "hard?"]
+
+# prepare(workdir) builds a case's input untimed and returns the timed run,
+# which returns how many items it processed
+Prepare = Callable[[pathlib.Path], Callable[[], int]]
+
+
+@dataclass
+class Case:
+    """A named benchmark."""
+
+    name: str
+    prepare: Prepare
+
+
+def random_title(rng: random.Random, words: int = 6) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_book(rng: random.Random, number: int) -> Book:
+    title = f"{random_title(rng)} {number}"
+    return Book(
+        title=title,
+        author=random_title(rng, 2),
+        slug=book_sync.slugify(title),
+        goodreads_url=f"https://www.goodreads.com/book/show/{number}",
+        book_id=str(number),
+        isbn=f"978{number:010d}",
+        rating=str(number % 6),
+        date_read="2024-01-01",
+        tags=["sci-fi", "essays"],
+    )
+
+
+def write_book_tree(books_dir: pathlib.Path, count: int, rng: random.Random) -> None:
+    """Write count book files in the shelf format, plus duplicates of every DUPLICATE_EVERY-th book."""
+    books_dir.mkdir(parents=True)
+    shelf = dataclasses.replace(FAVORITES, content_dir=books_dir)
+    for number in range(count):
+        book = synthetic_book(rng, number)
+        image_path = shelf.image_asset_path(f"{book.slug}.jpg")
+        content = f"{book_sync.build_front_matter(book, image_path, shelf)}\n\n"
+        (books_dir / f"{book.slug}.md").write_text(content, encoding="utf-8")
+        if number % DUPLICATE_EVERY == 0:
+            (books_dir / f"{book.slug}-copy.md").write_text(content, encoding="utf-8")
+
+
+def book_scan_case(count: int) -> Case:
+    """Index a shelf directory and remove its duplicates, as every book sync starts."""
+
+    def prepare(workdir: pathlib.Path) -> Callable[[], int]:
+        books_dir = workdir / "books"
+        write_book_tree(books_dir, count, random.Random(count))
+        shelf = dataclasses.replace(
+            FAVORITES, content_dir=books_dir, images_dir=workdir / "images", assets_dir=workdir)
+
+        def run() -> int:
+            with contextlib.redirect_stdout(io.StringIO()):
+                index = book_sync.BookIndex.scan(books_dir)
+                book_sync.remove_duplicate_books(shelf, index)
+            return count
+
+        return run
+
+    return Case(f"books_scan_dedup_{count}", prepare)
+
+
+def medium_article(rng: random.Random, number: int) -> str:
+    """Return a long article body shaped like Medium's content:encoded."""
+    sections = [f'<figure><img alt="Cover {number}" src="https://cdn-images-1.medium.com/max/1024/{number}.png">'
+                "<figcaption>Cover</figcaption></figure>"]
+    for part in range(MEDIUM_SECTIONS):
+        sections.append(
+            f"<h3>{random_title(rng, 4)}</h3>"
+            f"<p>{random_title(rng, 30)} <a href=\"https://example.com/{part}\">{random_title(rng, 3)}</a> "
+            f"<strong>{random_title(rng, 2)}</strong> <em>{random_title(rng, 2)}</em> <code>value_{part}</code></p>"
+            f"<pre>for item in range({part}):\n    print(item)</pre>"
+            f"<ul><li>{random_title(rng, 5)}</li><li>{random_title(rng, 5)}</li></ul>"
+            f"<blockquote>{random_title(rng, 12)}</blockquote>")
+    if number % 2:
+        sections.append(
+            f'<hr><p><em>Originally published at <a href="https://blog.example.com/{number}/">'
+            "blog.example.com</a> on March 3, 2023.</em></p>")
+    return "".join(sections)
+
+
+def medium_case() -> Case:
+    """Parse large Medium feed entries and convert their bodies to Markdown."""
+
+    def prepare(workdir: pathlib.Path) -> Callable[[], int]:
+        rng = random.Random(MEDIUM_ARTICLES)
+        items = "".join(
+            f"<item><title>Article {number}</title>"
+            f"<link>https://medium.com/@someone/article-{number}-{number:04x}?source=rss</link>"
+            "<category>python</category><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate>"
+            f"<content:encoded><![CDATA[{medium_article(rng, number)}]]></content:encoded></item>"
+            for number in range(MEDIUM_ARTICLES))
+        feed = feedparser.parse(
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0" '
+            'xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+            f"<channel><title>Medium</title>{items}</channel></rss>")
+
+        def run() -> int:
+            for entry in feed.entries:
+                post = parse_medium_entry(entry)
+                post.load()
+            return len(feed.entries)
+
+        return run
+
+    return Case(f"medium_parse_{MEDIUM_ARTICLES}x{MEDIUM_SECTIONS}", prepare)
+
+
+def throughput_case(name: str, function: Callable, make_input: Callable[[random.Random], object]) -> Case:
+    """Call function on THROUGHPUT_ITEMS generated inputs."""
+
+    def prepare(workdir: pathlib.Path) -> Callable[[], int]:
+        rng = random.Random(name)
+        inputs = [make_input(rng) for _ in range(THROUGHPUT_ITEMS)]
+
+        def run() -> int:
+            for value in inputs:
+                function(value)
+            return len(inputs)
+
+        return run
+
+    return Case(name, prepare)
+
+
+def toml_input(rng: random.Random) -> object:
+    """Return a front matter value of the kinds the scripts write."""
+    kind = rng.randrange(4)
+    if kind == 0:
+        return f'{random_title(rng)} "quoted" \\ path'
+    if kind == 1:
+        return [random_title(rng, 2) for _ in range(3)]
+    if kind == 2:
+        return rng.randrange(10000)
+    return rng.random() < 0.5
+
+
+def write_synthetic_pdf(path: pathlib.Path, pages: int) -> None:
+    """Write a slide deck with text and shapes on every page."""
+    import fitz
+
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page(width=960, height=540)
+        page.draw_rect(fitz.Rect(40, 40, 920, 500), color=(0.1, 0.2, 0.6), fill=(0.9, 0.93, 1.0))
+        for row in range(8):
+            page.insert_text((80, 100 + row * 45), f"Slide {number + 1}, line {row + 1}", fontsize=28)
+        page.draw_circle((800, 400), 60 + number, color=(0.8, 0.1, 0.1), fill=(1.0, 0.8, 0.2))
+    doc.save(str(path))
+    doc.close()
+
+
+def pdf_case() -> Case:
+    """Render a synthetic PDF to slide images."""
+
+    def prepare(workdir: pathlib.Path) -> Callable[[], int]:
+        from pdf_to_images import pdf_to_images
+
+        pdf_path = workdir / "slides.pdf"
+        write_synthetic_pdf(pdf_path, PDF_PAGES)
+
+        def run() -> int:
+            with contextlib.redirect_stdout(io.StringIO()):
+                pdf_to_images(pdf_path, workdir / "slides", prefix="slide")
+            return PDF_PAGES
+
+        return run
+
+    return Case(f"pdf_to_images_{PDF_PAGES}_pages", prepare)
+
+
+def build_cases(book_counts: List[int]) -> List[Case]:
+    cases = [book_scan_case(count) for count in book_counts]
+    cases.append(medium_case())
+    cases.append(throughput_case("slugify_books", book_sync.slugify, random_title))
+    cases.append(throughput_case("slugify_posts", posts_cli.slugify, random_title))
+    cases.append(throughput_case("to_toml_value_books", book_sync.to_toml_value, toml_input))
+    cases.append(throughput_case("to_toml_value_posts", posts_cli.to_toml_value, toml_input))
+    # pdf_to_images exits when PyMuPDF is missing, so only import it when it can run
+    if importlib.util.find_spec("fitz") is not None:
+        cases.append(pdf_case())
+    else:
+        print("Skipping pdf_to_images: PyMuPDF is not installed")
+    return cases
+
+
+def run_case(case: Case, repeat: int) -> Dict[str, float]:
+    """Time case repeat times on fresh input and summarize the timings.
+
+    Returns:
+        Median, min and max seconds per run, items per run and items per second
+    """
+    timings = []
+    items = 0
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+            run = case.prepare(pathlib.Path(workdir))
+            started = time.perf_counter()
+            items = run()
+            timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        "median": median,
+        "min": min(timings),
+        "max": max(timings),
+        "repeat": repeat,
+        "items": items,
+        "items_per_second": items / median if median else 0.0,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Print each case against the baseline and return the names of the regressed ones.
+
+    Cases are compared by time per item, so a baseline stays usable when
+    the number of items per run changes.
+    """
+    regressions = []
+    print(f"\n{'case':<32} {'items/s':>12} {'baseline':>12} {'change':>9}")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("items_per_second"):
+            print(f"{name:<32} {result['items_per_second']:>12,.1f} {'-':>12} {'new':>9}")
+            continue
+        change = previous["items_per_second"] / result["items_per_second"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<32} {result['items_per_second']:>12,.1f} {previous['items_per_second']:>12,.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def load_results(path: pathlib.Path) -> Optional[Dict[str, Dict[str, float]]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))["results"]
+
+
+def write_results(path: pathlib.Path, results: Dict[str, Dict[str, float]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+def book_counts(value: str) -> List[int]:
+    """Parse a comma-separated list of book counts."""
+    try:
+        counts = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid book counts '{value}', expected e.g. 100,1000")
+    if not counts or min(counts) < 1:
+        raise argparse.ArgumentTypeError(f"invalid book counts '{value}', expected e.g. 100,1000")
+    return counts
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the content import hot paths and compare against a baseline")
+    parser.add_argument("-k", "--filter", action="append", default=[],
+                        help="Only run cases whose name contains this text (repeatable)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per case; the median is reported (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--books", type=book_counts, default=DEFAULT_BOOK_COUNTS,
+                        help="Comma-separated book file counts for the scan cases (default: 100,1000,10000)")
+    parser.add_argument("-o", "--output", type=pathlib.Path, default=DEFAULT_OUTPUT,
+                        help=f"Where to write the results (default: {DEFAULT_OUTPUT.relative_to(ROOT_DIR)})")
+    parser.add_argument("--baseline", type=pathlib.Path, default=DEFAULT_BASELINE,
+                        help=f"Results to compare against (default: {DEFAULT_BASELINE.relative_to(ROOT_DIR)})")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Also save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Slowdown of the median that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Main entry point."""
+    args = parse_args()
+    cases = [case for case in build_cases(args.books)
+             if not args.filter or any(text in case.name for text in args.filter)]
+    if not cases:
+        print("No benchmark matches the filter")
+        sys.exit(1)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for case in cases:
+        print(f"Running {case.name}...", flush=True)
+        results[case.name] = run_case(case, args.repeat)
+
+    write_results(args.output, results)
+    print(f"Results written to {args.output}")
+
+    baseline = load_results(args.baseline)
+    regressions: List[str] = []
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; save one with --save-baseline")
+    else:
+        regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        write_results(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}: "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
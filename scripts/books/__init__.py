@@ -0,0 +1,5 @@
+"""Package for syncing Goodreads shelves into Hugo content."""
+
+from .cli import main
+
+__all__ = ["main"]
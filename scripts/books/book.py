@@ -0,0 +1,19 @@
+"""Book data transfer object."""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class Book:
+    title: str
+    author: str
+    slug: str
+    goodreads_url: str
+    book_id: str
+    isbn: str
+    rating: str = ""
+    date_read: str = ""
+    date_added: Optional[str] = None
+    image_url: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
@@ -0,0 +1,110 @@
+"""Goodreads shelves synced into the blog."""
+
+import pathlib
+from dataclasses import dataclass, field, replace
+from typing import FrozenSet, List, Tuple
+
+from common.cache import BLOG_DIR, blog_dir
+from common.goodreads import shelf_feed_url
+
+CONTENT_DIR = BLOG_DIR / "content"
+ASSETS_DIR = BLOG_DIR / "assets"
+
+
+@dataclass(frozen=True)
+class Shelf:
+    """Where a Goodreads shelf is synced to and which fields it writes.
+
+    fields maps front matter keys to Book attributes, after the title,
+    author, draft, goodreads_url, book_id and isbn keys every book has.
+    "image" is the cover path under assets/. Keys in optional_fields are
+    left out when empty.
+    """
+    name: str
+    label: str
+    feed_url: str
+    content_dir: pathlib.Path
+    images_dir: pathlib.Path
+    assets_dir: pathlib.Path = ASSETS_DIR
+    skip_book_ids: FrozenSet[str] = frozenset()
+    fields: Tuple[Tuple[str, str], ...] = (("image", "image"),)
+    optional_fields: FrozenSet[str] = field(default_factory=frozenset)
+
+    def image_asset_path(self, image_filename: str) -> str:
+        """Return an image's path relative to assets/, as used in front matter."""
+        return (self.images_dir / image_filename).relative_to(self.assets_dir).as_posix()
+
+    def moved_to(self, blog: pathlib.Path) -> "Shelf":
+        """Return this shelf with its directories under another blog directory."""
+        if blog == BLOG_DIR:
+            return self
+
+        def move(path: pathlib.Path) -> pathlib.Path:
+            return blog / path.relative_to(BLOG_DIR)
+
+        return replace(
+            self,
+            content_dir=move(self.content_dir),
+            images_dir=move(self.images_dir),
+            assets_dir=move(self.assets_dir),
+        )
+
+
+FAVORITES = Shelf(
+    name="favorites",
+    label="favorite books",
+    feed_url=shelf_feed_url("favorites"),
+    content_dir=CONTENT_DIR / "books/recommendations",
+    images_dir=ASSETS_DIR / "images/books/recommendations",
+    skip_book_ids=frozenset({"29630264", "40186304", "32855235", "7930361160", "216017751", "41832736", "16146899", "46184813", "64238935", "5973243", "6416196", "17340660", "60233239", "36223859", "57987464", "8176978",
+                             "36844711", "56377548", "8442726", "6567483", "56791389", "126917757", "6488124", "52949193", "18938240", "20572455", "8123311", "6219313", "62193738", "40053399", "43812338", "34810395", "40396699"}),
+    fields=(
+        ("rating", "rating"),
+        ("image", "image"),
+        ("date_read", "date_read"),
+        ("tags", "tags"),
+    ),
+    optional_fields=frozenset({"date_read", "tags"}),
+)
+
+CURRENTLY_READING = Shelf(
+    name="currently-reading",
+    label="currently-reading books",
+    feed_url=shelf_feed_url("currently-reading"),
+    content_dir=CONTENT_DIR / "books/currently-reading",
+    images_dir=ASSETS_DIR / "images/books/currently-reading",
+    skip_book_ids=frozenset(
+        {"29630264", "40186304", "32855235", "7930361160", "216017751"}),
+    fields=(
+        ("image", "image"),
+        ("date", "date_added"),
+    ),
+    optional_fields=frozenset({"date"}),
+)
+
+READ = Shelf(
+    name="read",
+    label="read books",
+    feed_url=shelf_feed_url("read"),
+    content_dir=CONTENT_DIR / "books/read",
+    images_dir=ASSETS_DIR / "images/books/read",
+    fields=(
+        ("rating", "rating"),
+        ("image", "image"),
+        ("date_read", "date_read"),
+        ("tags", "tags"),
+    ),
+    optional_fields=frozenset({"date_read", "tags"}),
+)
+
+SHELVES: List[Shelf] = [FAVORITES, CURRENTLY_READING, READ]
+# Shelves synced when none is named; read has no section on the site yet
+DEFAULT_SHELVES: List[str] = [FAVORITES.name, CURRENTLY_READING.name]
+
+
+def get_shelf(name: str) -> Shelf:
+    """Return the configured shelf with the given Goodreads name, writing into the current blog directory."""
+    for shelf in SHELVES:
+        if shelf.name == name:
+            return shelf.moved_to(blog_dir())
+    raise KeyError(f"Unknown shelf: {name}")
@@ -0,0 +1,570 @@
+"""Sync engine shared by all Goodreads shelves."""
+
+import pathlib
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+from common.covers import cached_miss_expiry, clean_isbn, get_image_url_from_sources, prefetch_covers
+from common.downloads import download_image, map_concurrently
+from common.feeds import config_fingerprint
+from common.files import atomic_writer, content_digest, write_if_changed
+from common.goodreads import ShelfFetch, fetch_shelf, remember_shelf
+from common.manifest import SyncManifest, entry_digest
+
+from .book import Book
+from .shelves import Shelf
+
+BOOK_ID_PATTERN = re.compile(r'book_id\s*=\s*"([^"]+)"')
+IMAGE_PATTERN = re.compile(r'image\s*=\s*"([^"]+)"')
+
+GOODREADS_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
+
+
+@dataclass
+class BookFile:
+    """A book content file already on disk."""
+    path: pathlib.Path
+    book_id: str
+    image_path: Optional[str]
+    content_length: int
+    digest: str
+
+
+class BookIndex:
+    """In-memory index of book content files keyed by book_id.
+
+    Built with a single pass over a shelf's content directory and kept in
+    sync as files are created or removed, so each content file is read at
+    most once per run.
+    """
+
+    def __init__(self) -> None:
+        self._files: Dict[str, List[BookFile]] = {}
+        self._by_path: Dict[pathlib.Path, BookFile] = {}
+
+    @classmethod
+    def scan(cls, books_dir: pathlib.Path) -> "BookIndex":
+        """Read every content file in books_dir once and index it by book_id."""
+        index = cls()
+        if not books_dir.exists():
+            return index
+
+        for book_file in sorted(books_dir.glob("*.md")):
+            try:
+                content = book_file.read_text(encoding="utf-8")
+            except Exception as err:
+                print(f"Error checking {book_file.name}: {err}")
+                continue
+
+            book_id_match = BOOK_ID_PATTERN.search(content)
+            if not book_id_match:
+                continue
+            image_match = IMAGE_PATTERN.search(content)
+            index.add(BookFile(
+                path=book_file,
+                book_id=book_id_match.group(1),
+                image_path=image_match.group(1) if image_match else None,
+                content_length=len(content),
+                digest=content_digest(content),
+            ))
+        return index
+
+    def get(self, book_id: str) -> Optional[BookFile]:
+        """Return the first indexed file for book_id, if any."""
+        files = self._files.get(book_id)
+        return files[0] if files else None
+
+    def files_for(self, book_id: str) -> List[BookFile]:
+        """Return all indexed files for book_id."""
+        return list(self._files.get(book_id, []))
+
+    def book_ids(self) -> List[str]:
+        """Return all indexed book_ids."""
+        return list(self._files)
+
+    def __iter__(self) -> Iterator[BookFile]:
+        for files in list(self._files.values()):
+            yield from list(files)
+
+    def add(self, book_file: BookFile) -> None:
+        """Index a file, replacing any previous entry for the same path."""
+        previous = self._by_path.get(book_file.path)
+        if previous:
+            self.remove(previous)
+        self._files.setdefault(book_file.book_id, []).append(book_file)
+        self._by_path[book_file.path] = book_file
+
+    def remove(self, book_file: BookFile) -> None:
+        """Drop a file from the index."""
+        self._by_path.pop(book_file.path, None)
+        files = self._files.get(book_file.book_id, [])
+        if book_file in files:
+            files.remove(book_file)
+        if not files:
+            self._files.pop(book_file.book_id, None)
+
+
+def slugify(text: str) -> str:
+    """Convert text to a filesystem-friendly slug."""
+    slug = text.lower()
+    slug = re.sub(r'[^\w\s-]', '', slug)
+    slug = re.sub(r'[-\s]+', '-', slug)
+    slug = slug.strip('-')
+    return slug
+
+
+def to_toml_value(value) -> str:
+    """Convert a Python value to TOML format."""
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, list):
+        escaped_items = []
+        for item in value:
+            escaped = item.replace("\\", "\\\\").replace('"', '\\"')
+            escaped_items.append(f'"{escaped}"')
+        return f"[{', '.join(escaped_items)}]"
+    if isinstance(value, str):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+
+    return f'"{str(value)}"'
+
+
+def build_front_matter(book: Book, image_path: str, shelf: Shelf) -> str:
+    """Build TOML front matter with the fields configured for the shelf."""
+    fields = {
+        "title": book.title,
+        "author": book.author,
+        "draft": False,
+        "goodreads_url": book.goodreads_url,
+        "book_id": book.book_id,
+        "isbn": book.isbn,
+    }
+
+    values = {**vars(book), "image": image_path}
+    for key, attribute in shelf.fields:
+        value = values[attribute]
+        # Optional fields are only included if they have a value
+        if key in shelf.optional_fields and not value:
+            continue
+        fields[key] = value
+
+    lines = ["+++"]
+    for key, value in fields.items():
+        lines.append(f"{key} = {to_toml_value(value)}")
+    lines.append("+++")
+    return "\n".join(lines)
+
+
+def clean_goodreads_url(url: str) -> str:
+    """Remove the utm_medium and utm_source query parameters Goodreads adds."""
+    if "?utm_medium=api&utm_source=rss" in url:
+        return url.replace("?utm_medium=api&utm_source=rss", "")
+    if "&utm_medium=api&utm_source=rss" in url:
+        return url.replace("&utm_medium=api&utm_source=rss", "")
+    return url
+
+
+def parse_goodreads_date(raw_value: str) -> Optional[str]:
+    """Convert a Goodreads RSS date to YYYY-MM-DD, or None if it can't be parsed."""
+    try:
+        return datetime.strptime(raw_value, GOODREADS_DATE_FORMAT).strftime("%Y-%m-%d")
+    except (ValueError, AttributeError):
+        return None
+
+
+def parse_goodreads_books(shelf_fetch: ShelfFetch, shelf: Shelf) -> List[Book]:
+    """Extract books from the merged pages of a Goodreads shelf feed."""
+    if shelf_fetch.bozo_exception is not None:
+        print(f"Error parsing RSS feed: {shelf_fetch.bozo_exception}")
+        return []
+
+    books = []
+    for entry in shelf_fetch.entries:
+        book_id = entry.get("book_id", "").strip()
+        if book_id in shelf.skip_book_ids:
+            continue
+
+        title = entry.get("title", "").strip()
+        author = entry.get("author_name", "").strip()
+        goodreads_url = clean_goodreads_url(entry.get("link", "").strip())
+
+        # user_read_at is when the book was read; user_date_added is when it
+        # was put on this shelf. Unparseable read dates are kept as they are.
+        date_read_raw = entry.get("user_read_at", "").strip()
+        date_read = ""
+        if date_read_raw:
+            date_read = parse_goodreads_date(date_read_raw) or date_read_raw
+        date_added_raw = entry.get("user_date_added", "").strip()
+        date_added = parse_goodreads_date(
+            date_added_raw) if date_added_raw else None
+
+        image_url = entry.get("book_large_image_url",
+                              "") or entry.get("book_image_url", "")
+        image_url = image_url.strip() if image_url else None
+
+        # Tags are the user's other shelves
+        # Feedparser stores all RSS item fields directly accessible via dict access
+        tags = []
+        user_shelves = entry.get("user_shelves", "")
+        if user_shelves:
+            tags = [
+                tag.strip()
+                for tag in str(user_shelves).split(",")
+                if tag.strip() and tag.strip().lower() != shelf.name
+            ]
+
+        books.append(Book(
+            title=title,
+            author=author,
+            slug=slugify(f"{title}-{author}"),
+            goodreads_url=goodreads_url,
+            book_id=book_id,
+            isbn=entry.get("isbn", "").strip(),
+            rating=entry.get("user_rating", "").strip(),
+            date_read=date_read,
+            date_added=date_added,
+            image_url=image_url,
+            tags=tags,
+        ))
+
+    return books
+
+
+def determine_image_filename(slug: str, image_url: str) -> str:
+    """Determine image filename preserving extension."""
+    suffix = pathlib.Path(urlparse(image_url).path).suffix.lower()
+    if suffix not in {".jpg", ".jpeg", ".png", ".gif", ".webp"}:
+        suffix = ".jpg"
+    return f"{slug}{suffix}"
+
+
+@dataclass
+class ImageResult:
+    """Outcome of making sure a book has a cover image on disk."""
+    image_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+def existing_image(book: Book, shelf: Shelf, index: BookIndex) -> Optional[str]:
+    """Return the cover path recorded in the book's existing file, if that image is still on disk."""
+    existing = index.get(book.book_id)
+    if existing and existing.image_path and (shelf.assets_dir / existing.image_path).exists():
+        return existing.image_path
+    return None
+
+
+def needs_image(book: Book, shelf: Shelf, index: BookIndex) -> bool:
+    """Return True if the book has no cover image on disk yet."""
+    return existing_image(book, shelf, index) is None
+
+
+def prepare_image(
+    book: Book,
+    shelf: Shelf,
+    index: BookIndex,
+    refresh_cover: bool = False,
+    lookup_current: bool = False,
+) -> ImageResult:
+    """Find and download the book's cover unless an existing file already has one.
+
+    With refresh_cover the cover is looked up and downloaded again even if
+    one is on disk; lookup_current says the cached lookup was just
+    refreshed in bulk and can be used as it is. Safe to run concurrently:
+    it only reads the index and touches the shelf's images directory.
+    """
+    existing = index.get(book.book_id)
+
+    # If book exists, update it without refetching image
+    image_path = None if refresh_cover else existing_image(book, shelf, index)
+    if image_path:
+        return ImageResult(image_path=image_path)
+
+    image_url = book.image_url
+
+    # If no image from RSS, try alternative sources
+    if not image_url:
+        image_url = get_image_url_from_sources(
+            book.book_id, book.isbn, book.title, book.author,
+            refresh=refresh_cover and not lookup_current)
+
+    if not image_url:
+        if existing:
+            return ImageResult(error=f"Skipping update for '{book.title}' - no image available")
+        return ImageResult(error=f"Skipping '{book.title}' - no image available")
+
+    image_filename = determine_image_filename(book.slug, image_url)
+    image_path_local = shelf.images_dir / image_filename
+
+    if refresh_cover or not image_path_local.exists():
+        try:
+            download_image(image_url, image_path_local, revalidate=refresh_cover)
+        except Exception as err:
+            return ImageResult(error=f"Failed to download image for '{book.title}': {err}")
+
+    return ImageResult(image_path=shelf.image_asset_path(image_filename))
+
+
+def process_book(book: Book, shelf: Shelf, index: BookIndex, image: ImageResult) -> tuple[bool, str]:
+    """Create the book's content file, or update the existing one.
+
+    Returns:
+        tuple[bool, str]: (success, action) where action is "created", "updated",
+        "unchanged", or "skipped"
+    """
+    if image.error:
+        print(image.error)
+        return False, "skipped"
+
+    shelf.content_dir.mkdir(parents=True, exist_ok=True)
+
+    front_matter = build_front_matter(book, image.image_path, shelf)
+    content = f"{front_matter}\n\n"
+
+    # Find existing book by book_id
+    digest = content_digest(content)
+    existing = index.get(book.book_id)
+    if existing:
+        if existing.digest == digest:
+            return True, "unchanged"
+        # The scan already showed the file differs, so don't read it again
+        with atomic_writer(existing.path) as handle:
+            handle.write(content.encode("utf-8"))
+        index.add(BookFile(existing.path, book.book_id,
+                  image.image_path, len(content), digest))
+        print(f"Updated: {book.title}")
+        return True, "updated"
+
+    book_file = shelf.content_dir / f"{book.slug}.md"
+    write_if_changed(book_file, content)
+    index.add(BookFile(book_file, book.book_id,
+              image.image_path, len(content), digest))
+    print(f"Created: {book.title}")
+    return True, "created"
+
+
+def remove_book_file(book_file: BookFile, shelf: Shelf, index: BookIndex, keep_image_name: Optional[str] = None) -> None:
+    """Delete a book content file and its image, and drop it from the index."""
+    book_file.path.unlink()
+    index.remove(book_file)
+    if book_file.image_path:
+        image_file = shelf.images_dir / pathlib.Path(book_file.image_path).name
+        # Only remove image if it's different from the one we're keeping
+        if image_file.exists() and image_file.name != keep_image_name:
+            image_file.unlink()
+
+
+def remove_skipped_books(shelf: Shelf, index: BookIndex) -> None:
+    """Remove existing books that are in the skip list."""
+    removed_count = 0
+    for book_file in list(index):
+        if book_file.book_id not in shelf.skip_book_ids:
+            continue
+        try:
+            remove_book_file(book_file, shelf, index)
+            removed_count += 1
+            print(f"Removed skipped book: {book_file.path.stem}")
+        except Exception as err:
+            print(f"Error checking {book_file.path.name}: {err}")
+            continue
+
+    if removed_count > 0:
+        print(f"Removed {removed_count} books from skip list.")
+
+
+def remove_duplicate_books(shelf: Shelf, index: BookIndex) -> None:
+    """Remove duplicate books that have the same book_id."""
+    removed_count = 0
+    for book_id in index.book_ids():
+        file_data = index.files_for(book_id)
+        if len(file_data) > 1:
+            # Sort by content length (longer usually means more complete title with series info)
+            file_data.sort(key=lambda x: x.content_length, reverse=True)
+
+            # Keep the first one (longest content)
+            keep_file = file_data[0]
+
+            # Get the image path from the file we're keeping
+            keep_image_name = None
+            if keep_file.image_path:
+                keep_image_name = pathlib.Path(keep_file.image_path).name
+
+            for duplicate_file in file_data[1:]:
+                try:
+                    remove_book_file(duplicate_file, shelf,
+                                     index, keep_image_name)
+                    removed_count += 1
+                    print(
+                        f"Removed duplicate: {duplicate_file.path.stem} (same book_id as {keep_file.path.stem})")
+                except Exception as err:
+                    print(
+                        f"Error removing duplicate {duplicate_file.path.name}: {err}")
+                    continue
+
+    if removed_count > 0:
+        print(f"Removed {removed_count} duplicate books.")
+
+
+def remove_books_not_in_feed(feed_book_ids: set[str], shelf: Shelf, index: BookIndex) -> None:
+    """Remove existing books that are not in the feed."""
+    removed_count = 0
+    for book_file in list(index):
+        # Skip if in skip list (handled separately)
+        if book_file.book_id in shelf.skip_book_ids:
+            continue
+        if book_file.book_id in feed_book_ids:
+            continue
+        try:
+            remove_book_file(book_file, shelf, index)
+            removed_count += 1
+            print(f"Removed book not in feed: {book_file.path.stem}")
+        except Exception as err:
+            print(f"Error checking {book_file.path.name}: {err}")
+            continue
+
+    if removed_count > 0:
+        print(f"Removed {removed_count} books not in feed.")
+
+
+def should_refresh_cover(book: Book, refresh_covers: set[str]) -> bool:
+    """Return True if the cached cover lookup for this book should be ignored."""
+    return book.book_id in refresh_covers or (bool(book.isbn) and book.isbn in refresh_covers)
+
+
+def shelf_fingerprint(shelf: Shelf) -> str:
+    """Hash the shelf settings that change the files a sync writes."""
+    return config_fingerprint(sorted(shelf.skip_book_ids), shelf.fields, sorted(shelf.optional_fields))
+
+
+@dataclass
+class ShelfSync:
+    """A shelf's downloaded feed, or the error that stopped the download."""
+    shelf: Shelf
+    fingerprint: str
+    fetch: Optional[ShelfFetch] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class SyncCounts:
+    """What happened to the books of one shelf."""
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: int = 0
+
+    def summary(self) -> str:
+        return f"Created: {self.created}, Updated: {self.updated}, Unchanged: {self.unchanged}, Skipped: {self.skipped}"
+
+
+def fetch_shelves(shelves: List[Shelf], force: bool = False) -> List[ShelfSync]:
+    """Download the feeds of all shelves concurrently, in shelf order."""
+    def fetch(shelf: Shelf) -> ShelfSync:
+        fingerprint = shelf_fingerprint(shelf)
+        try:
+            return ShelfSync(shelf, fingerprint, fetch=fetch_shelf(
+                shelf.feed_url, fingerprint, conditional=not force))
+        except Exception as err:
+            return ShelfSync(shelf, fingerprint, error=str(err))
+
+    return map_concurrently(fetch, shelves, max_workers=max(len(shelves), 1))
+
+
+def sync_shelf(sync: ShelfSync, refresh_covers: set[str], rebuild: bool = False) -> Optional[SyncCounts]:
+    """Bring a shelf's content files and covers in line with its feed.
+
+    Books whose feed entry is unchanged since they were last written are
+    skipped before any file or network access, unless rebuild is set.
+
+    Returns:
+        Optional[SyncCounts]: what happened to each book, or None if nothing was synced
+    """
+    shelf = sync.shelf
+    if sync.error is not None:
+        print(f"Error fetching RSS feed: {sync.error}")
+        return None
+
+    if sync.fetch.not_modified:
+        print("Feed unchanged since last sync, nothing to do.")
+        return None
+
+    manifest = SyncManifest(shelf.content_dir, sync.fingerprint, shelf.assets_dir)
+    books = parse_goodreads_books(sync.fetch, shelf)
+    if books:
+        print(f"Found {len(books)} {shelf.label} in feed.")
+
+    feed_book_ids = {book.book_id for book in books}
+    digests = {book.book_id: entry_digest(vars(book)) for book in books}
+    # Books named with --refresh-cover are processed whatever the manifest says
+    changed = [book for book in books
+               if rebuild or should_refresh_cover(book, refresh_covers)
+               or not manifest.is_unchanged(book.book_id, digests[book.book_id])]
+    removed_ids = [book_id for book_id in manifest.keys()
+                   if book_id not in feed_book_ids]
+
+    counts = SyncCounts(unchanged=len(books) - len(changed))
+    if books and not changed and not removed_ids:
+        remember_shelf(sync.fetch, sync.fingerprint)
+        return counts
+
+    index = BookIndex.scan(shelf.content_dir)
+
+    remove_skipped_books(shelf, index)
+    remove_duplicate_books(shelf, index)
+
+    if not books:
+        print(f"No {shelf.label} found in feed.")
+    # An empty feed means remove all
+    remove_books_not_in_feed(feed_book_ids, shelf, index)
+    for book_id in removed_ids:
+        manifest.forget(book_id)
+
+    # Resolve missing covers in bulk first; only books Open Library has no
+    # cover for are then looked up one by one
+    pending = [book for book in changed
+               if should_refresh_cover(book, refresh_covers) or needs_image(book, shelf, index)]
+    lookups = [book for book in pending if not book.image_url]
+    prefetched = prefetch_covers(
+        [(book.isbn, book.title, book.author) for book in lookups],
+        refresh=[clean_isbn(book.isbn) for book in lookups
+                 if should_refresh_cover(book, refresh_covers)],
+    )
+
+    # Download covers concurrently, then write files in feed order
+    results = map_concurrently(
+        lambda book: prepare_image(
+            book, shelf, index,
+            refresh_cover=should_refresh_cover(book, refresh_covers),
+            lookup_current=clean_isbn(book.isbn) in prefetched),
+        pending,
+    )
+    images = {book.book_id: image for book, image in zip(pending, results)}
+
+    # When each skipped book is worth another try: once its cached cover
+    # miss expires, or next run if the lookup or download failed
+    skipped: Dict[str, float] = {}
+    for book in changed:
+        image = images.get(book.book_id) or prepare_image(book, shelf, index)
+        success, action = process_book(book, shelf, index, image)
+        if not success:
+            manifest.forget(book.book_id)
+            counts.skipped += 1
+            skipped[book.book_id] = cached_miss_expiry(book.isbn, book.title, book.author) or 0
+            continue
+        manifest.record(book.book_id, digests[book.book_id],
+                        index.get(book.book_id).path, image.image_path)
+        if action == "created":
+            counts.created += 1
+        elif action == "updated":
+            counts.updated += 1
+        elif action == "unchanged":
+            counts.unchanged += 1
+
+    manifest.save()
+    remember_shelf(sync.fetch, sync.fingerprint, skipped)
+    return counts if books else None
@@ -0,0 +1 @@
+"""Utilities shared by the content import scripts."""
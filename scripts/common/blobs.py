@@ -0,0 +1,217 @@
+"""Content-addressed store for downloaded images.
+
+Every downloaded image is kept once under .cache/blobs, named by the
+sha256 of its bytes. The slug-named files under blog/assets are hardlinks
+to those blobs, so the same cover on two shelves, or an image whose post
+or book was retitled, takes up disk space once and is not downloaded again.
+"""
+
+import hashlib
+import mmap
+import os
+import pathlib
+import shutil
+import threading
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from .cache import JsonStore, cache_dir
+from .files import atomic_writer
+
+# Maps image URLs to the digest of the bytes they served
+url_digests = JsonStore("blob_urls")
+# Maps image URLs to the ETag/Last-Modified headers served with those bytes
+url_validators = JsonStore("blob_validators")
+
+
+def file_digest(path: pathlib.Path) -> str:
+    """Return the sha256 of a file, hashing it through mmap instead of reading it into memory."""
+    hasher = hashlib.sha256()
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+    return hasher.hexdigest()
+
+
+class BlobStats:
+    """Thread-safe totals of what deduplication avoided."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.reused = 0
+        self.bytes_saved = 0
+
+    def record(self, reused: bool, size: int) -> None:
+        with self._lock:
+            if reused:
+                self.reused += 1
+                self.bytes_saved += size
+            else:
+                self.stored += 1
+
+    def summary(self) -> str:
+        return f"{self.stored} images stored, {self.reused} reused ({format_bytes(self.bytes_saved)} saved)"
+
+
+def format_bytes(size: int) -> str:
+    """Format a byte count for humans."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class BlobStore:
+    """Directory of files named by the sha256 of their content."""
+
+    def __init__(self, root: Optional[pathlib.Path] = None) -> None:
+        self._root = root
+        self.stats = BlobStats()
+
+    @property
+    def root(self) -> pathlib.Path:
+        return self._root or cache_dir() / "blobs"
+
+    def path_for(self, digest: str) -> pathlib.Path:
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def link(self, digest: str, destination: pathlib.Path) -> bool:
+        """Point destination at a stored blob, replacing whatever it held.
+
+        Falls back to copying where hardlinks are not possible, for example
+        across filesystems.
+
+        Returns:
+            bool: False if destination already was a link to the blob
+        """
+        blob_path = self.path_for(digest)
+        if destination.exists() and os.path.samefile(destination, blob_path):
+            return False
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = destination.with_name(
+            f".{destination.name}.{uuid.uuid4().hex[:8]}.link")
+        try:
+            os.link(blob_path, tmp_path)
+        except OSError:
+            with atomic_writer(destination) as handle, blob_path.open("rb") as source:
+                shutil.copyfileobj(source, handle)
+            return True
+        try:
+            os.replace(tmp_path, destination)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return True
+
+    def adopt(self, path: pathlib.Path, digest: Optional[str] = None) -> Tuple[str, bool]:
+        """Take a file into the store, or swap it for a link if its content is already stored.
+
+        Returns:
+            Tuple[str, bool]: the file's digest and whether an existing blob was reused
+        """
+        digest = digest or file_digest(path)
+        blob_path = self.path_for(digest)
+        size = path.stat().st_size
+
+        if blob_path.exists():
+            if not os.path.samefile(path, blob_path):
+                self.link(digest, path)
+                self.stats.record(True, size)
+                return digest, True
+            return digest, False
+
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, blob_path)
+        except FileExistsError:
+            # Another thread stored the same bytes first
+            self.link(digest, path)
+            self.stats.record(True, size)
+            return digest, True
+        except OSError:
+            with atomic_writer(blob_path) as handle, path.open("rb") as source:
+                shutil.copyfileobj(source, handle)
+        self.stats.record(False, size)
+        return digest, False
+
+    def staging_path(self) -> pathlib.Path:
+        """Return a fresh path for a download to be written to before it is stored."""
+        staging_dir = self.root / "incoming"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        return staging_dir / uuid.uuid4().hex
+
+    def store(self, path: pathlib.Path, digest: str) -> bool:
+        """Move a complete file into the store, or drop it if its content is already stored.
+
+        Returns:
+            bool: True if an existing blob was reused
+        """
+        blob_path = self.path_for(digest)
+        size = path.stat().st_size
+        if blob_path.exists():
+            path.unlink()
+            self.stats.record(True, size)
+            return True
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, blob_path)
+        self.stats.record(False, size)
+        return False
+
+    def digest_for(self, url: str) -> Optional[str]:
+        """Return the digest of the blob a URL served before, if it is still stored."""
+        digest = url_digests.get(url)
+        return digest if digest and self.has(digest) else None
+
+    def validators_for(self, url: str) -> Dict[str, str]:
+        """Return the ETag/Last-Modified validators a URL's stored blob was served with."""
+        return url_validators.get(url) or {}
+
+    def link_url(self, url: str, destination: pathlib.Path) -> bool:
+        """Link destination to the blob a URL served before, if it is still stored.
+
+        Returns:
+            bool: True if destination now holds the image and no download is needed
+        """
+        digest = self.digest_for(url)
+        if not digest:
+            return False
+        # Only a new link avoided a download; an unchanged one saved nothing
+        if self.link(digest, destination):
+            self.stats.record(True, destination.stat().st_size)
+        return True
+
+    def remember_url(self, url: str, digest: str, validators: Optional[Dict[str, str]] = None) -> None:
+        url_digests.set(url, digest)
+        if validators:
+            url_validators.set(url, validators)
+        else:
+            url_validators.delete(url)
+
+    def save(self) -> None:
+        """Persist the URL indexes."""
+        url_digests.save()
+        url_validators.save()
+
+    def dedupe(self, paths: Iterable[pathlib.Path]) -> int:
+        """Adopt existing files into the store.
+
+        Returns:
+            int: bytes saved by replacing duplicates with links
+        """
+        saved = 0
+        for path in paths:
+            if path.name.startswith(".") or not path.is_file():
+                continue
+            _, reused = self.adopt(path)
+            if reused:
+                saved += path.stat().st_size
+        return saved
+
+
+blob_store = BlobStore()
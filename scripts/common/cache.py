@@ -0,0 +1,95 @@
+"""On-disk JSON stores kept under the repository .cache directory."""
+
+import json
+import os
+import pathlib
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .files import atomic_writer
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent.parent
+CACHE_DIR = pathlib.Path(os.environ.get("CACHE_DIR") or ROOT_DIR / ".cache")
+BLOG_DIR = pathlib.Path(os.environ.get("BLOG_DIR") or ROOT_DIR / "blog")
+
+
+def cache_dir() -> pathlib.Path:
+    """Return the directory the stores are kept in."""
+    return CACHE_DIR
+
+
+def blog_dir() -> pathlib.Path:
+    """Return the Hugo site the import scripts write content into."""
+    return BLOG_DIR
+
+
+def use_state_dirs(cache: pathlib.Path, blog: pathlib.Path) -> None:
+    """Keep the stores in cache and write content into blog for the rest of the run.
+
+    Stores resolve their paths when first read, so this must run before
+    anything is loaded.
+    """
+    global CACHE_DIR, BLOG_DIR
+    CACHE_DIR, BLOG_DIR = cache, blog
+
+
+class JsonStore:
+    """Thread-safe key/value store persisted as a single JSON file.
+
+    The file is read lazily on first access and only written back by save()
+    when something changed.
+    """
+
+    def __init__(self, name: str, cache_dir: Optional[pathlib.Path] = None) -> None:
+        self.name = name
+        self._cache_dir = cache_dir
+        self._data: Optional[Dict[str, Any]] = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def path(self) -> pathlib.Path:
+        return (self._cache_dir or cache_dir()) / f"{self.name}.json"
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._data = {}
+            except (ValueError, OSError) as err:
+                print(f"Ignoring unreadable cache {self.path.name}: {err}")
+                self._data = {}
+        return self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the stored value for key."""
+        with self._lock:
+            return self._load().get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key."""
+        with self._lock:
+            self._load()[key] = value
+            self._dirty = True
+
+    def delete(self, key: str) -> None:
+        """Remove key if present."""
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._dirty = True
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Iterate over a snapshot of the stored items."""
+        with self._lock:
+            return iter(list(self._load().items()))
+
+    def save(self) -> None:
+        """Persist the store if it changed since it was loaded."""
+        with self._lock:
+            if not self._dirty or self._data is None:
+                return
+            payload = json.dumps(self._data, indent=2, sort_keys=True)
+            with atomic_writer(self.path) as handle:
+                handle.write(f"{payload}\n".encode("utf-8"))
+            self._dirty = False
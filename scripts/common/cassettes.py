@@ -0,0 +1,195 @@
+"""Record HTTP traffic to a directory of cassettes and replay it offline.
+
+Recording saves every request the shared client sends, with the response
+headers, the full body (images included) and how long it took, as one file
+per exchange. Replaying answers the same requests from those files without
+touching the network, optionally sleeping for the recorded time so that
+runs can be timed against realistic latency.
+"""
+
+import hashlib
+import json
+import pathlib
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .files import atomic_writer
+from .http_cache import BODY_ENCODING_HEADERS
+
+CASSETTE_SUFFIX = ".http"
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Raised when a replayed request was never recorded."""
+
+
+def exchange_key(method: str, url: str) -> str:
+    """Name the cassettes of a method and URL."""
+    return hashlib.sha256(f"{method.upper()} {url}".encode("utf-8")).hexdigest()[:24]
+
+
+def request_conditions(headers: Mapping[str, str]) -> Dict[str, str]:
+    """Return the conditional headers of a request, which decide between recorded answers."""
+    headers = CaseInsensitiveDict(headers)
+    return {name: headers[name] for name in CONDITIONAL_HEADERS if headers.get(name)}
+
+
+@dataclass
+class Exchange:
+    """One recorded request and its response."""
+
+    method: str
+    url: str
+    status: int
+    reason: str
+    headers: Dict[str, str]
+    elapsed: float
+    conditions: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+
+class CassetteStore:
+    """Directory of recorded exchanges, one file per request.
+
+    Each file holds a line of JSON metadata followed by the response body.
+    Recording a URL again replaces whatever was recorded for it before.
+    """
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._recorded: Dict[str, int] = {}
+        self._exchanges: Optional[Dict[str, List[Exchange]]] = None
+        self._cursors: Dict[str, int] = {}
+
+    def record(self, exchange: Exchange) -> None:
+        key = exchange_key(exchange.method, exchange.url)
+        with self._lock:
+            if key not in self._recorded:
+                for stale in self.directory.glob(f"{key}-*{CASSETTE_SUFFIX}"):
+                    stale.unlink()
+            sequence = self._recorded.get(key, 0)
+            self._recorded[key] = sequence + 1
+        metadata = asdict(exchange)
+        del metadata["body"]
+        path = self.directory / f"{key}-{sequence:04d}{CASSETTE_SUFFIX}"
+        with atomic_writer(path) as handle:
+            handle.write(json.dumps(metadata).encode("utf-8") + b"\n")
+            handle.write(exchange.body)
+
+    def _load(self) -> Dict[str, List[Exchange]]:
+        if self._exchanges is None:
+            exchanges: Dict[str, List[Exchange]] = {}
+            for path in sorted(self.directory.glob(f"*{CASSETTE_SUFFIX}")):
+                with path.open("rb") as handle:
+                    metadata = json.loads(handle.readline())
+                    body = handle.read()
+                exchange = Exchange(**metadata, body=body)
+                exchanges.setdefault(exchange_key(exchange.method, exchange.url), []).append(exchange)
+            self._exchanges = exchanges
+        return self._exchanges
+
+    def find(self, method: str, url: str, headers: Mapping[str, str]) -> Exchange:
+        """Return the recorded answer to a request.
+
+        Exchanges for the same URL are replayed in the order they were
+        recorded, preferring those sent with the same conditional headers;
+        a request with no matching conditions never gets a recorded 304.
+        The last one is repeated once they run out.
+        """
+        key = exchange_key(method, url)
+        with self._lock:
+            recorded = self._load().get(key)
+            if not recorded:
+                raise CassetteMiss(f"No recorded response for {method} {url} in {self.directory}")
+            conditions = request_conditions(headers)
+            candidates = ([exchange for exchange in recorded if exchange.conditions == conditions]
+                          or [exchange for exchange in recorded if exchange.status != 304]
+                          or recorded)
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return candidates[min(cursor, len(candidates) - 1)]
+
+
+def exchange_response(exchange: Exchange, request: requests.PreparedRequest) -> requests.Response:
+    """Build the response a replayed exchange stands for."""
+    response = requests.Response()
+    response.status_code = exchange.status
+    response.reason = exchange.reason
+    response.headers = CaseInsensitiveDict(exchange.headers)
+    response.headers["Content-Length"] = str(len(exchange.body))
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = exchange.url
+    response.request = request
+    response._content = exchange.body
+    response._content_consumed = True
+    return response
+
+
+class RecordingAdapter(BaseAdapter):
+    """Transport adapter that sends requests through another adapter and saves every exchange.
+
+    The body is read before the response is returned, so streamed responses
+    are recorded in full and then served to the caller from memory.
+    """
+
+    def __init__(self, store: CassetteStore, adapter: BaseAdapter) -> None:
+        super().__init__()
+        self.store = store
+        self.adapter = adapter
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        started = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        body = response.content
+        self.store.record(Exchange(
+            method=request.method or "GET",
+            url=request.url or "",
+            status=response.status_code,
+            reason=response.reason or "",
+            headers={key: value for key, value in response.headers.items()
+                     if key.lower() not in BODY_ENCODING_HEADERS},
+            elapsed=time.perf_counter() - started,
+            conditions=request_conditions(request.headers),
+            body=body,
+        ))
+        return response
+
+    def close(self) -> None:
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers every request from a CassetteStore, without network access."""
+
+    def __init__(
+        self,
+        store: CassetteStore,
+        latency: bool = False,
+        on_request: Optional[Callable[[], None]] = None,
+    ) -> None:
+        super().__init__()
+        self.store = store
+        self.latency = latency
+        self.on_request = on_request
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        exchange = self.store.find(request.method or "GET", request.url or "", request.headers)
+        if self.latency and exchange.elapsed > 0:
+            time.sleep(exchange.elapsed)
+        if self.on_request:
+            self.on_request()
+        response = exchange_response(exchange, request)
+        response.connection = self
+        return response
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,463 @@
+"""Book cover lookup across Open Library and Google Books."""
+
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+from .cache import JsonStore
+from .downloads import DOWNLOAD_WORKERS
+from .http_client import get_client
+
+PROVIDER_TIMEOUT = 5
+
+GOOGLE_BOOKS_API = os.environ.get(
+    "GOOGLE_BOOKS_API", "https://www.googleapis.com/books/v1/volumes")
+OPENLIBRARY_URL = os.environ.get("OPENLIBRARY_URL", "https://openlibrary.org").rstrip("/")
+OPENLIBRARY_COVERS_URL = os.environ.get(
+    "OPENLIBRARY_COVERS_URL", "https://covers.openlibrary.org").rstrip("/")
+OPENLIBRARY_BOOKS_API = f"{OPENLIBRARY_URL}/api/books"
+BULK_CHUNK_SIZE = 50
+BULK_TIMEOUT = 15
+
+# Outcomes and latencies kept per provider, and how many are needed before
+# a provider with a hit rate under MIN_HIT_RATE is skipped. Skipped
+# providers are still tried on every EXPLORE_EVERY-th lookup so their stats
+# keep up with reality.
+PROVIDER_SAMPLES = 100
+MIN_SAMPLES = 20
+MIN_HIT_RATE = 0.05
+EXPLORE_EVERY = 10
+
+# How long resolved covers and known misses are trusted, in seconds
+HIT_TTL = 180 * 24 * 60 * 60
+MISS_TTL = 7 * 24 * 60 * 60
+
+CoverProvider = Callable[[str, str, str], Optional[str]]
+
+_executor: Optional[ThreadPoolExecutor] = None
+cover_cache = JsonStore("covers")
+provider_store = JsonStore("cover_providers")
+
+# ISBNs the bulk lookup found no Open Library cover for during this run
+bulk_misses: Set[str] = set()
+
+
+def clean_isbn(isbn: str) -> str:
+    """Return the ISBN if it is usable for lookups, otherwise an empty string."""
+    isbn_clean = (isbn or "").strip()
+    if len(isbn_clean) >= 10:
+        return isbn_clean
+    return ""
+
+
+def google_books_image(data: dict) -> Optional[str]:
+    """Pick the largest cover from a Google Books volumes response."""
+    if data.get("items") and len(data["items"]) > 0:
+        image_links = data["items"][0].get(
+            "volumeInfo", {}).get("imageLinks", {})
+        if image_links.get("extraLarge"):
+            return image_links.get("extraLarge")
+        if image_links.get("large"):
+            return image_links.get("large")
+    return None
+
+
+def check_transient_error(response: requests.Response) -> None:
+    """Raise for responses that say nothing about whether a cover exists."""
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+
+
+def openlibrary_isbn_cover(isbn: str, title: str, author: str) -> Optional[str]:
+    """Check whether Open Library has a cover for the ISBN."""
+    url = f"{OPENLIBRARY_COVERS_URL}/b/isbn/{isbn}-L.jpg"
+    response = get_client().head(url, timeout=PROVIDER_TIMEOUT)
+    check_transient_error(response)
+    if response.status_code == 200:
+        return url
+    return None
+
+
+def google_books_isbn_cover(isbn: str, title: str, author: str) -> Optional[str]:
+    """Look up a cover on Google Books by ISBN."""
+    google_url = f"{GOOGLE_BOOKS_API}?q=isbn:{isbn}"
+    response = get_client().get(google_url, timeout=PROVIDER_TIMEOUT)
+    check_transient_error(response)
+    if response.status_code == 200:
+        return google_books_image(response.json())
+    return None
+
+
+def google_books_title_cover(isbn: str, title: str, author: str) -> Optional[str]:
+    """Look up a cover on Google Books by title and author."""
+    query = f"{title} {author}".replace(" ", "+")
+    google_url = f"{GOOGLE_BOOKS_API}?q={query}"
+    response = get_client().get(google_url, timeout=PROVIDER_TIMEOUT)
+    check_transient_error(response)
+    if response.status_code == 200:
+        return google_books_image(response.json())
+    return None
+
+
+def openlibrary_search_cover(isbn: str, title: str, author: str) -> Optional[str]:
+    """Look up a cover through the Open Library search API."""
+    query = f"{title}".replace(" ", "+")
+    if author:
+        query += f"+{author}".replace(" ", "+")
+    open_lib_url = f"{OPENLIBRARY_URL}/search.json?q={query}&limit=1"
+    response = get_client().get(open_lib_url, timeout=PROVIDER_TIMEOUT)
+    check_transient_error(response)
+    if response.status_code == 200:
+        data = response.json()
+        if data.get("docs") and len(data["docs"]) > 0:
+            cover_id = data["docs"][0].get("cover_i")
+            if cover_id:
+                return f"{OPENLIBRARY_COVERS_URL}/b/id/{cover_id}-L.jpg"
+    return None
+
+
+def openlibrary_bulk_covers(isbns: List[str]) -> Dict[str, str]:
+    """Look up covers for many ISBNs with one Open Library books API request.
+
+    Returns:
+        Dict[str, str]: cover URLs keyed by ISBN, for the ISBNs that have one
+    """
+    response = get_client().get(OPENLIBRARY_BOOKS_API, params={
+        "bibkeys": ",".join(f"ISBN:{isbn}" for isbn in isbns),
+        "format": "json",
+        "jscmd": "data",
+    }, timeout=BULK_TIMEOUT)
+    response.raise_for_status()
+
+    covers = {}
+    for bibkey, record in response.json().items():
+        cover = (record or {}).get("cover") or {}
+        image_url = cover.get("large") or cover.get("medium")
+        if image_url and bibkey.startswith("ISBN:"):
+            covers[bibkey[len("ISBN:"):]] = image_url
+    return covers
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """A cover provider, its quality tier and the book fields it needs.
+
+    Lower tiers give better matches: an ISBN lookup finds the exact edition,
+    a title search may not. Providers are only reordered within a tier.
+    """
+    name: str
+    lookup: CoverProvider
+    tier: int
+    needs: Tuple[str, ...]
+
+
+PROVIDERS: List[ProviderSpec] = [
+    ProviderSpec("openlibrary_isbn", openlibrary_isbn_cover, 0, ("isbn",)),
+    ProviderSpec("google_books_isbn", google_books_isbn_cover, 0, ("isbn",)),
+    ProviderSpec("google_books_title", google_books_title_cover,
+                 1, ("title", "author")),
+    ProviderSpec("openlibrary_search", openlibrary_search_cover, 1, ("title",)),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Return the nearest-rank percentile of values."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class ProviderStats:
+    """Hit rate and latency of each cover provider, kept across runs.
+
+    Each provider keeps its last PROVIDER_SAMPLES outcomes ("h" hit, "m"
+    miss, "e" error) and latencies in .cache/cover_providers.json. With
+    adaptive False the stats are still kept but providers are always asked
+    in their configured order, none skipped.
+    """
+
+    def __init__(self, store: JsonStore) -> None:
+        self.store = store
+        self.adaptive = True
+        self._lock = threading.Lock()
+        self._skipped: Dict[str, int] = {}
+        self.used: Dict[str, int] = {}
+
+    def record(self, name: str, outcome: str, latency: float) -> None:
+        with self._lock:
+            entry = self.store.get(name) or {"outcomes": "", "latencies": []}
+            self.store.set(name, {
+                "outcomes": (entry["outcomes"] + outcome)[-PROVIDER_SAMPLES:],
+                "latencies": (entry["latencies"] + [round(latency * 1000)])[-PROVIDER_SAMPLES:],
+            })
+            self.used[name] = self.used.get(name, 0) + 1
+
+    def hit_rate(self, name: str) -> Optional[float]:
+        """Return the provider's recent hit rate, or None without enough samples."""
+        outcomes = (self.store.get(name) or {}).get("outcomes", "")
+        if len(outcomes) < MIN_SAMPLES:
+            return None
+        return outcomes.count("h") / len(outcomes)
+
+    def latency(self, name: str, pct: float) -> Optional[float]:
+        """Return a latency percentile in milliseconds, if the provider was used."""
+        latencies = (self.store.get(name) or {}).get("latencies", [])
+        return percentile(latencies, pct) if latencies else None
+
+    def sort_key(self, spec: ProviderSpec) -> Tuple[int, float, float]:
+        """Order by quality tier, then likelier and faster providers first."""
+        if not self.adaptive:
+            return (spec.tier, 0.0, 0.0)
+        hit_rate = self.hit_rate(spec.name)
+        p50 = self.latency(spec.name, 50)
+        # Untried providers get the benefit of the doubt
+        return (spec.tier,
+                -round(hit_rate if hit_rate is not None else 1.0, 1),
+                p50 if p50 is not None else 0.0)
+
+    def should_skip(self, name: str) -> bool:
+        """Return True if the provider rarely finds anything and isn't due a retry."""
+        if not self.adaptive:
+            return False
+        hit_rate = self.hit_rate(name)
+        if hit_rate is None or hit_rate >= MIN_HIT_RATE:
+            return False
+        with self._lock:
+            self._skipped[name] = self._skipped.get(name, 0) + 1
+            return self._skipped[name] % EXPLORE_EVERY != 0
+
+    def summary_lines(self) -> List[str]:
+        """Describe each provider used during this run."""
+        lines = []
+        for spec in PROVIDERS:
+            if spec.name not in self.used:
+                continue
+            outcomes = (self.store.get(spec.name) or {}).get("outcomes", "")
+            hits = outcomes.count("h")
+            lines.append(
+                f"{spec.name}: {self.used[spec.name]} lookups, "
+                f"{hits}/{len(outcomes)} recent hits ({hits / len(outcomes):.0%}), "
+                f"errors {outcomes.count('e')}, "
+                f"p50 {self.latency(spec.name, 50):.0f} ms, p95 {self.latency(spec.name, 95):.0f} ms")
+        return lines
+
+
+provider_stats = ProviderStats(provider_store)
+PROVIDER_NAMES = {spec.lookup: spec.name for spec in PROVIDERS}
+
+
+def applicable_providers(isbn: str, title: str, author: str) -> List[CoverProvider]:
+    """Return the providers that can answer for this book, best first.
+
+    Providers keep their quality tier; within a tier they are ordered by
+    observed hit rate and latency, and ones that rarely find anything are
+    skipped as long as another provider can still answer.
+    """
+    fields = {"isbn": isbn, "title": title, "author": author}
+    specs = [
+        spec for spec in PROVIDERS
+        if all(fields[field] for field in spec.needs)
+        # No need to ask Open Library again if the bulk lookup already did
+        and not (spec.lookup is openlibrary_isbn_cover and isbn in bulk_misses)
+    ]
+    specs.sort(key=provider_stats.sort_key)
+    kept = [spec for spec in specs if not provider_stats.should_skip(spec.name)]
+    return [spec.lookup for spec in (kept or specs[:1])]
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool shared by all cover lookups.
+
+    It has a thread for every provider of every book being downloaded at
+    once, so no lookup waits behind another book's.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=len(PROVIDERS) * DOWNLOAD_WORKERS, thread_name_prefix="cover-lookup")
+    return _executor
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and strip punctuation and repeated whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text or "").lower().split())
+
+
+def cache_keys(isbn: str, title: str, author: str) -> List[str]:
+    """Return the cover cache keys that describe a book."""
+    keys = []
+    if clean_isbn(isbn):
+        keys.append(f"isbn:{clean_isbn(isbn)}")
+    if title:
+        keys.append(f"title:{normalize_text(title)}|{normalize_text(author)}")
+    return keys
+
+
+def get_cached_cover(keys: List[str]) -> Optional[dict]:
+    """Return the cached lookup for a book if one is still fresh.
+
+    A cached cover under any key wins; a miss is only trusted when every key
+    is a fresh miss.
+    """
+    now = time.time()
+    entries = []
+    for key in keys:
+        entry = cover_cache.get(key)
+        if not entry or entry.get("expires", 0) < now:
+            entries.append(None)
+            continue
+        if entry.get("url"):
+            return entry
+        entries.append(entry)
+    if entries and all(entries):
+        return entries[0]
+    return None
+
+
+def cached_miss_expiry(isbn: str, title: str, author: str) -> Optional[int]:
+    """Return when a book's cached cover miss expires, or None if no fresh miss is cached."""
+    keys = cache_keys(isbn, title, author)
+    cached = get_cached_cover(keys)
+    if not cached or cached.get("url"):
+        return None
+    return min(cover_cache.get(key)["expires"] for key in keys)
+
+
+def store_cover(keys: List[str], image_url: Optional[str]) -> None:
+    """Remember a lookup result, with a shorter lifetime for misses."""
+    ttl = HIT_TTL if image_url else MISS_TTL
+    entry = {"url": image_url, "expires": int(time.time() + ttl)}
+    for key in keys:
+        cover_cache.set(key, entry)
+
+
+def save_cover_cache() -> None:
+    """Persist cover lookups and provider stats from this run."""
+    cover_cache.save()
+    provider_store.save()
+
+
+def prefetch_covers(books: Iterable[Tuple[str, str, str]], refresh: Iterable[str] = ()) -> Set[str]:
+    """Resolve covers for many books at once with chunked Open Library bulk requests.
+
+    books are (isbn, title, author) tuples; ISBNs in refresh are looked up
+    even if cached. Covers found are cached, so the per-book lookups that
+    follow get them without a request. Books still unresolved fall back to
+    the other providers.
+
+    Returns:
+        Set[str]: the ISBNs whose covers were found
+    """
+    refresh = set(refresh)
+    isbns: List[str] = []
+    keys_by_isbn: Dict[str, List[str]] = {}
+    for isbn, title, author in books:
+        isbn = clean_isbn(isbn)
+        if not isbn or isbn in keys_by_isbn:
+            continue
+        keys = cache_keys(isbn, title, author)
+        if isbn not in refresh and get_cached_cover(keys):
+            continue
+        keys_by_isbn[isbn] = keys
+        isbns.append(isbn)
+
+    chunks = [isbns[start:start + BULK_CHUNK_SIZE]
+              for start in range(0, len(isbns), BULK_CHUNK_SIZE)]
+
+    def lookup(chunk: List[str]) -> Optional[Dict[str, str]]:
+        try:
+            return openlibrary_bulk_covers(chunk)
+        except Exception as err:
+            print(f"Bulk cover lookup failed, looking books up one by one: {err}")
+            return None
+
+    found: Set[str] = set()
+    for chunk, covers in zip(chunks, get_executor().map(lookup, chunks)):
+        # A failed request says nothing about these ISBNs
+        if covers is None:
+            continue
+        for isbn in chunk:
+            if covers.get(isbn):
+                store_cover(keys_by_isbn[isbn], covers[isbn])
+                found.add(isbn)
+            else:
+                bulk_misses.add(isbn)
+    return found
+
+
+def get_image_url_from_sources(book_id: str, isbn: str, title: str, author: str, refresh: bool = False) -> Optional[str]:
+    """Return the best cover URL for a book, consulting the on-disk cache first.
+
+    Pass refresh=True to ignore any cached result and query the providers again.
+    """
+    keys = cache_keys(isbn, title, author)
+    if not refresh:
+        cached = get_cached_cover(keys)
+        if cached:
+            return cached.get("url")
+
+    image_url, complete = resolve_cover(isbn, title, author)
+    # Don't remember a miss caused by a provider error
+    if image_url or complete:
+        store_cover(keys, image_url)
+    return image_url
+
+
+def timed_lookup(provider: CoverProvider, isbn: str, title: str, author: str) -> Optional[str]:
+    """Run a provider and record its outcome and latency."""
+    name = PROVIDER_NAMES.get(provider, getattr(provider, "__name__", "provider"))
+    started = time.monotonic()
+    try:
+        image_url = provider(isbn, title, author)
+    except Exception:
+        provider_stats.record(name, "e", time.monotonic() - started)
+        raise
+    provider_stats.record(name, "h" if image_url else "m",
+                          time.monotonic() - started)
+    return image_url
+
+
+def resolve_cover(isbn: str, title: str, author: str) -> Tuple[Optional[str], bool]:
+    """Query all cover providers concurrently and return the best result.
+
+    Every provider is started at once and they keep their priority order: a
+    result is returned as soon as every higher-priority provider has
+    answered without a cover. Lookups that haven't started by then are
+    cancelled; running ones finish in the background.
+
+    Returns:
+        Tuple[Optional[str], bool]: (image_url, complete) where complete is
+        False if any provider failed instead of answering
+    """
+    isbn = clean_isbn(isbn)
+    providers = applicable_providers(isbn, title, author)
+    if not providers:
+        return None, True
+
+    executor = get_executor()
+    futures: List[Future] = [
+        executor.submit(timed_lookup, provider, isbn, title, author)
+        for provider in providers
+    ]
+
+    pending = set(futures)
+    try:
+        while pending:
+            _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in futures:
+                if not future.done():
+                    # A better provider is still running, keep waiting
+                    break
+                if future.exception() is None and future.result():
+                    return future.result(), True
+        return None, all(future.exception() is None for future in futures)
+    finally:
+        for future in pending:
+            future.cancel()
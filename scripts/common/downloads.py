@@ -0,0 +1,130 @@
+"""Streaming image downloads with size limits and per-host concurrency caps."""
+
+import hashlib
+import os
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+
+from .blobs import blob_store
+from .http_client import IMAGE_ACCEPT, conditional_headers, get_client, response_validators
+
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "8"))
+DOWNLOADS_PER_HOST = int(os.environ.get("DOWNLOADS_PER_HOST", "4"))
+MAX_IMAGE_BYTES = int(os.environ.get("MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+# Some CDNs serve covers without an image/* type
+ALLOWED_CONTENT_TYPES = ("image/", "application/octet-stream", "binary/octet-stream")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class HostLimiter:
+    """Caps the number of concurrent requests made to any single host."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Hold one of the host's slots for the duration of the block."""
+        host = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.limit))
+        with semaphore:
+            yield
+
+
+host_limiter = HostLimiter(DOWNLOADS_PER_HOST)
+
+
+def check_image_response(response: requests.Response, max_bytes: int) -> None:
+    """Reject responses that are not images or are larger than max_bytes."""
+    content_type = response.headers.get(
+        "Content-Type", "").split(";")[0].strip().lower()
+    if content_type and not content_type.startswith(ALLOWED_CONTENT_TYPES):
+        raise ValueError(f"Unexpected content type '{content_type}'")
+
+    content_length = response.headers.get("Content-Length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise ValueError(
+            f"Image is {content_length} bytes, over the {max_bytes} byte limit")
+
+
+def download_image(
+    url: str,
+    destination: pathlib.Path,
+    max_bytes: int = MAX_IMAGE_BYTES,
+    revalidate: bool = False,
+) -> None:
+    """Stream an image into the blob store and link destination to it.
+
+    A URL that was downloaded before is linked from the store without a
+    request, or with revalidate, with a conditional request that sends the
+    stored ETag/Last-Modified. Neither a 304 nor a download whose bytes are
+    already stored rewrites destination if it already links to them.
+    """
+    known_digest = blob_store.digest_for(url)
+    if known_digest and not revalidate:
+        blob_store.link_url(url, destination)
+        return
+
+    headers = {"Accept": IMAGE_ACCEPT}
+    if known_digest:
+        headers.update(conditional_headers(blob_store.validators_for(url)))
+
+    hasher = hashlib.sha256()
+    staging_path = blob_store.staging_path()
+    try:
+        with host_limiter.slot(url):
+            with get_client().get(url, headers=headers, stream=True) as response:
+                if known_digest and response.status_code == 304:
+                    blob_store.link_url(url, destination)
+                    return
+                response.raise_for_status()
+                check_image_response(response, max_bytes)
+                validators = response_validators(response)
+
+                received = 0
+                with staging_path.open("xb") as handle:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > max_bytes:
+                            raise ValueError(
+                                f"Image is over the {max_bytes} byte limit")
+                        handle.write(chunk)
+                        hasher.update(chunk)
+
+                # Content-Length is the encoded size, so only compare plain bodies
+                content_length = response.headers.get("Content-Length", "")
+                if (content_length.isdigit() and not response.headers.get("Content-Encoding")
+                        and received != int(content_length)):
+                    raise ValueError(
+                        f"Image truncated at {received} of {content_length} bytes")
+
+        digest = hasher.hexdigest()
+        blob_store.store(staging_path, digest)
+    finally:
+        staging_path.unlink(missing_ok=True)
+
+    blob_store.link(digest, destination)
+    blob_store.remember_url(url, digest, validators)
+
+
+def map_concurrently(func: Callable[[T], R], items: Iterable[T], max_workers: int = DOWNLOAD_WORKERS) -> List[R]:
+    """Run func over items on a bounded thread pool, keeping input order."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as executor:
+        return list(executor.map(func, items))
@@ -0,0 +1,68 @@
+"""Feed downloads with conditional requests."""
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import feedparser
+
+from .cache import JsonStore
+from .http_client import conditional_headers, get_client, response_validators
+
+feed_state = JsonStore("feeds")
+
+
+@dataclass
+class FeedFetch:
+    """Result of fetching a feed, possibly answered with 304 Not Modified."""
+    url: str
+    not_modified: bool = False
+    feed: Optional[feedparser.FeedParserDict] = None
+    validators: Dict[str, str] = field(default_factory=dict)
+
+
+def config_fingerprint(*parts: object) -> str:
+    """Hash the settings that change how a feed is synced."""
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def fetch_feed(url: str, validators: Optional[Dict[str, str]] = None) -> FeedFetch:
+    """Download and parse a feed, sending ETag/Last-Modified validators if given."""
+    headers = conditional_headers(validators)
+    response = get_client().get(url, headers=headers)
+    if response.status_code == 304 and headers:
+        return FeedFetch(url=url, not_modified=True, validators=dict(validators or {}))
+    response.raise_for_status()
+
+    feed = feedparser.parse(
+        response.content,
+        response_headers={
+            key.lower(): value for key, value in response.headers.items()},
+    )
+    return FeedFetch(url=url, feed=feed, validators=response_validators(response))
+
+
+def parse_feed(location: str) -> feedparser.FeedParserDict:
+    """Parse a feed from a URL, downloaded through the shared client and its cache, or from a local file."""
+    if urlsplit(location).scheme in ("http", "https"):
+        return fetch_feed(location).feed
+    return feedparser.parse(location)
+
+
+def load_feed_state(url: str, fingerprint: str) -> Dict[str, Any]:
+    """Return what was stored for url after its last sync.
+
+    Nothing is returned if the sync settings changed since then, so a
+    different fingerprint forces a full download.
+    """
+    state = feed_state.get(url) or {}
+    if state.get("fingerprint", "") != fingerprint:
+        return {}
+    return state
+
+
+def save_feed_state(url: str, fingerprint: str, state: Dict[str, Any]) -> None:
+    """Store state for url once its contents have been fully synced."""
+    feed_state.set(url, {**state, "fingerprint": fingerprint})
+    feed_state.save()
@@ -0,0 +1,53 @@
+"""Filesystem helpers for generated content and assets."""
+
+import hashlib
+import os
+import pathlib
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
+
+
+@contextmanager
+def atomic_writer(destination: pathlib.Path) -> Iterator[BinaryIO]:
+    """Write to a temp file next to destination and rename it into place.
+
+    The destination only ever holds complete content: if the block raises or
+    the process is interrupted, the temp file is removed and any previous
+    file is left untouched.
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = destination.with_name(
+        f".{destination.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with tmp_path.open("xb") as handle:
+            yield handle
+        os.replace(tmp_path, destination)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def content_digest(content: str) -> str:
+    """Return a stable hash of text content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def write_if_changed(path: pathlib.Path, content: str) -> bool:
+    """Write content to path unless the file already holds exactly that text.
+
+    Leaving identical files alone keeps their mtimes, so Hugo and the CI
+    resources cache don't see a change.
+
+    Returns:
+        bool: True if the file was written
+    """
+    data = content.encode("utf-8")
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    with atomic_writer(path) as handle:
+        handle.write(data)
+    return True
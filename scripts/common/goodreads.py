@@ -0,0 +1,160 @@
+"""Goodreads shelf feeds, fetched page by page."""
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import feedparser
+
+from .downloads import map_concurrently
+from .feeds import FeedFetch, fetch_feed, load_feed_state, save_feed_state
+
+GOODREADS_LIST_RSS = os.environ.get(
+    "GOODREADS_FEED",
+    "https://www.goodreads.com/review/list_rss/68793210?key=Q5sTrEOdYsUhUSrXK0J7wg9adkkcAuTFlIKN8-TetPnEWK2-",
+)
+
+PAGE_WORKERS = 4
+MAX_PAGES = 200
+# Books per page, requested with per_page; a shorter page is the last one
+PAGE_SIZE = 100
+
+
+@dataclass
+class ShelfFetch:
+    """All entries of a shelf, or a note that no page changed since the last sync."""
+    url: str
+    not_modified: bool = False
+    entries: List[feedparser.FeedParserDict] = field(default_factory=list)
+    bozo_exception: Optional[Exception] = None
+    pages: List[Dict[str, str]] = field(default_factory=list)
+    last_page_full: bool = False
+
+
+def with_query_param(url: str, key: str, value: str) -> str:
+    """Return url with the query parameter key set to value."""
+    split = urlsplit(url)
+    query = [(name, item) for name, item in parse_qsl(
+        split.query, keep_blank_values=True) if name != key]
+    query.append((key, value))
+    return urlunsplit((split.scheme, split.netloc, split.path, urlencode(query), split.fragment))
+
+
+def shelf_feed_url(shelf: str) -> str:
+    """Return the RSS feed URL of one of our Goodreads shelves."""
+    return with_query_param(GOODREADS_LIST_RSS, "shelf", shelf)
+
+
+def page_url(feed_url: str, page: int) -> str:
+    """Return the URL of a page of a shelf feed, with PAGE_SIZE books per page."""
+    url = with_query_param(feed_url, "per_page", str(PAGE_SIZE))
+    if page == 1:
+        return url
+    return with_query_param(url, "page", str(page))
+
+
+def fetch_pages(feed_url: str, pages: List[int], validators: List[Dict[str, str]]) -> List[FeedFetch]:
+    """Fetch several pages of a shelf at once, in page order."""
+    def fetch(page: int) -> FeedFetch:
+        page_validators = validators[page -
+                                     1] if page <= len(validators) else None
+        return fetch_feed(page_url(feed_url, page), page_validators)
+
+    return map_concurrently(fetch, pages, max_workers=PAGE_WORKERS)
+
+
+def page_entries(fetch: FeedFetch) -> list:
+    return list(fetch.feed.entries) if fetch.feed is not None else []
+
+
+def fetch_shelf(feed_url: str, fingerprint: str = "", conditional: bool = True) -> ShelfFetch:
+    """Fetch every page of a shelf concurrently and merge them in shelf order.
+
+    Goodreads doesn't say how many pages a shelf has, so pages of PAGE_SIZE
+    books are requested in concurrent batches until one comes back short or
+    adds no new book. Pages seen on the last sync are revalidated together;
+    if none changed the shelf is reported as not modified, unless books
+    skipped on that sync are due a retry. Entries are de-duplicated by
+    book_id.
+    """
+    state = load_feed_state(feed_url, fingerprint) if conditional else {}
+    if "retry_at" in state and state["retry_at"] <= time.time():
+        # Books skipped last time are due another try, which a 304 would prevent
+        state = {}
+    known_pages: List[Dict[str, str]] = state.get("pages", [])
+
+    pages = list(range(1, len(known_pages) + 1)) or [1]
+    if state.get("last_page_full"):
+        # The shelf may have grown onto a new page
+        pages.append(len(known_pages) + 1)
+    fetches = fetch_pages(feed_url, pages, known_pages)
+
+    grown = len(fetches) > len(known_pages) and any(
+        page_entries(fetch) for fetch in fetches[len(known_pages):])
+    if known_pages and not grown and all(fetch.not_modified for fetch in fetches[:len(known_pages)]):
+        return ShelfFetch(url=feed_url, not_modified=True)
+
+    # Something changed, so download unchanged pages again for their entries
+    stale = [page for page, fetch in enumerate(
+        fetches, start=1) if fetch.not_modified]
+    for page, fetch in zip(stale, fetch_pages(feed_url, stale, [])):
+        fetches[page - 1] = fetch
+
+    # Merge pages in order until a short page, or one that adds no new
+    # book_id (a server ignoring the page parameter repeats page 1)
+    result = ShelfFetch(url=feed_url)
+    seen_ids: Set[str] = set()
+    merged: List[FeedFetch] = []
+    repeated = False
+    while True:
+        for fetch in fetches:
+            entries = page_entries(fetch)
+            book_ids = {entry.get("book_id", "").strip() for entry in entries} - {""}
+            if merged and not book_ids - seen_ids:
+                repeated = bool(entries)
+                break
+            merged.append(fetch)
+            if fetch.feed is not None and fetch.feed.bozo and result.bozo_exception is None:
+                result.bozo_exception = fetch.feed.bozo_exception
+            for entry in entries:
+                book_id = entry.get("book_id", "").strip()
+                if book_id and book_id in seen_ids:
+                    continue
+                seen_ids.add(book_id)
+                result.entries.append(entry)
+            if len(entries) < PAGE_SIZE:
+                break
+        else:
+            if len(merged) < MAX_PAGES:
+                next_pages = list(range(len(merged) + 1,
+                                        min(len(merged) + PAGE_WORKERS, MAX_PAGES) + 1))
+                fetches = fetch_pages(feed_url, next_pages, [])
+                continue
+        break
+
+    # Only pages with entries are worth revalidating next time
+    result.pages = [fetch.validators for fetch in merged if page_entries(fetch)]
+    result.last_page_full = (not repeated and bool(merged)
+                             and len(page_entries(merged[-1])) >= PAGE_SIZE)
+    return result
+
+
+def remember_shelf(shelf: ShelfFetch, fingerprint: str = "", skipped: Optional[Dict[str, float]] = None) -> None:
+    """Store the shelf's page validators once it has been synced.
+
+    skipped maps the book_ids that couldn't be written to when they are
+    worth trying again; the shelf is downloaded in full once the earliest
+    of those times has passed.
+    """
+    if shelf.not_modified or shelf.bozo_exception is not None:
+        return
+    state: Dict[str, Any] = {
+        "pages": shelf.pages,
+        "last_page_full": shelf.last_page_full,
+    }
+    if skipped:
+        state["skipped"] = sorted(skipped)
+        state["retry_at"] = min(skipped.values())
+    save_feed_state(shelf.url, fingerprint, state)
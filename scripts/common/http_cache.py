@@ -0,0 +1,350 @@
+"""On-disk cache for GET responses, following the caching rules of RFC 9111.
+
+Responses are kept under .cache/http, one file per URL, and served again
+while they are fresh according to their Cache-Control, Expires or
+Last-Modified headers. Stale responses with an ETag or Last-Modified are
+revalidated with a conditional request, and a 304 refreshes the stored copy.
+A max_stale allowance serves stale responses without any request, for
+iterating offline on the import scripts.
+"""
+
+import hashlib
+import json
+import math
+import os
+import pathlib
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .cache import cache_dir
+from .files import atomic_writer
+
+# Statuses a response can be stored with without explicit freshness
+HEURISTIC_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+# Responses with only a Last-Modified are fresh for a tenth of their age,
+# as RFC 9111 suggests, but never longer than a day
+HEURISTIC_FRACTION = 0.1
+MAX_HEURISTIC_LIFETIME = 24 * 60 * 60
+
+# Headers that describe the encoded body rather than the decoded one that is stored
+BODY_ENCODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Split a Cache-Control header into lowercase directives and their arguments."""
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.strip().lower()] = argument.strip().strip('"') or None
+    return directives
+
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    """Return an HTTP date header as a timestamp, or None if it is missing or invalid."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def parse_seconds(value: Optional[str]) -> Optional[int]:
+    """Parse a delta-seconds directive argument."""
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+def conditional_headers(validators: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Return If-None-Match/If-Modified-Since headers for stored ETag/Last-Modified validators."""
+    headers: Dict[str, str] = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def max_stale_seconds(value: str) -> float:
+    """Parse a --max-stale duration such as 300, 30m, 12h or 7d."""
+    match = re.fullmatch(r"\s*(\d+)\s*([smhd]?)\s*", value.lower())
+    if not match:
+        raise ValueError(f"invalid duration '{value}', expected e.g. 300, 30m, 12h or 7d")
+    return int(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+
+def request_url(url: str, params: Optional[Mapping] = None) -> str:
+    """Return the URL a request is sent to once its params are encoded."""
+    prepared = requests.models.PreparedRequest()
+    prepared.prepare_url(url, params)
+    return prepared.url
+
+
+@dataclass
+class CacheEntry:
+    """A stored response with the times it was requested and received."""
+
+    url: str
+    status: int
+    reason: str
+    headers: Dict[str, str]
+    request_time: float
+    response_time: float
+    # Values of the request headers named by the response's Vary header
+    vary: Dict[str, Optional[str]] = field(default_factory=dict)
+    body: bytes = b""
+
+    @classmethod
+    def from_response(
+        cls,
+        url: str,
+        response: requests.Response,
+        request_headers: Mapping[str, str],
+        request_time: float,
+        response_time: float,
+    ) -> "CacheEntry":
+        headers = {key: value for key, value in response.headers.items()
+                   if key.lower() not in BODY_ENCODING_HEADERS}
+        return cls(
+            url=url,
+            status=response.status_code,
+            reason=response.reason or "",
+            headers=headers,
+            request_time=request_time,
+            response_time=response_time,
+            vary=vary_values(response.headers.get("Vary"), request_headers),
+            body=response.content,
+        )
+
+    def header(self, name: str) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get(name)
+
+    @property
+    def cache_control(self) -> Dict[str, Optional[str]]:
+        return parse_cache_control(self.header("Cache-Control"))
+
+    def freshness_lifetime(self) -> float:
+        """Seconds the response stays fresh after it was generated."""
+        directives = self.cache_control
+        max_age = parse_seconds(directives.get("max-age"))
+        if max_age is not None:
+            return max_age
+
+        date = parse_http_date(self.header("Date")) or self.response_time
+        if self.header("Expires") is not None:
+            expires = parse_http_date(self.header("Expires"))
+            return max(expires - date, 0) if expires is not None else 0
+
+        last_modified = parse_http_date(self.header("Last-Modified"))
+        if last_modified is not None and self.status in HEURISTIC_STATUSES:
+            return min(max(date - last_modified, 0) * HEURISTIC_FRACTION, MAX_HEURISTIC_LIFETIME)
+        return 0
+
+    def current_age(self, now: float) -> float:
+        """Seconds since the origin generated the response."""
+        date = parse_http_date(self.header("Date"))
+        apparent_age = max(self.response_time - date, 0) if date is not None else 0
+        age_value = parse_seconds(self.header("Age")) or 0
+        corrected_age = age_value + (self.response_time - self.request_time)
+        return max(apparent_age, corrected_age) + (now - self.response_time)
+
+    def usable(self, now: float, max_stale: Optional[float]) -> bool:
+        """Return True if the response can be served without contacting the origin."""
+        directives = self.cache_control
+        if "no-cache" in directives:
+            return False
+        staleness = self.current_age(now) - self.freshness_lifetime()
+        if staleness < 0:
+            return True
+        if max_stale is None or "must-revalidate" in directives:
+            return False
+        return staleness <= max_stale
+
+    def validators(self) -> Dict[str, str]:
+        validators = {}
+        if self.header("ETag"):
+            validators["etag"] = self.header("ETag")
+        if self.header("Last-Modified"):
+            validators["last_modified"] = self.header("Last-Modified")
+        return validators
+
+    def matches(self, request_headers: Mapping[str, str]) -> bool:
+        """Return True if the request sends the same values for every header the response varies on."""
+        return vary_values(",".join(self.vary), request_headers) == self.vary
+
+    def satisfies(self, request_headers: Mapping[str, str]) -> bool:
+        """Return True if the request's own validators already match this response."""
+        headers = CaseInsensitiveDict(request_headers)
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match is not None:
+            etag = self.header("ETag")
+            return bool(etag) and (if_none_match.strip() == "*" or etag in [
+                tag.strip() for tag in if_none_match.split(",")])
+        since = parse_http_date(headers.get("If-Modified-Since"))
+        last_modified = parse_http_date(self.header("Last-Modified"))
+        return since is not None and last_modified is not None and last_modified <= since
+
+    def refreshed(self, response: requests.Response, request_time: float, response_time: float) -> "CacheEntry":
+        """Return the entry updated with the headers of a 304 that validated it."""
+        headers = CaseInsensitiveDict(self.headers)
+        for key, value in response.headers.items():
+            if key.lower() not in BODY_ENCODING_HEADERS:
+                headers[key] = value
+        return CacheEntry(
+            url=self.url,
+            status=self.status,
+            reason=self.reason,
+            headers=dict(headers.items()),
+            request_time=request_time,
+            response_time=response_time,
+            vary=self.vary,
+            body=self.body,
+        )
+
+    def to_response(self, not_modified: bool = False) -> requests.Response:
+        """Build a response from the entry, or a 304 for a request it satisfies."""
+        response = requests.Response()
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        if not_modified:
+            response.status_code = 304
+            response.reason = "Not Modified"
+            response._content = b""
+        else:
+            response.status_code = self.status
+            response.reason = self.reason
+            response._content = self.body
+            response.encoding = get_encoding_from_headers(response.headers)
+        return response
+
+
+def vary_values(vary: Optional[str], request_headers: Mapping[str, str]) -> Dict[str, Optional[str]]:
+    """Return the request's values for the headers named in a Vary header."""
+    headers = CaseInsensitiveDict(request_headers)
+    names = [name.strip().lower() for name in (vary or "").split(",") if name.strip()]
+    return {name: headers.get(name) for name in names}
+
+
+def is_storable(response: requests.Response, request_headers: Mapping[str, str]) -> bool:
+    """Return True if the response may be stored and is worth storing."""
+    if "no-store" in parse_cache_control(CaseInsensitiveDict(request_headers).get("Cache-Control")):
+        return False
+    directives = parse_cache_control(response.headers.get("Cache-Control"))
+    if "no-store" in directives or response.headers.get("Vary", "").strip() == "*":
+        return False
+    if response.status_code not in HEURISTIC_STATUSES:
+        return False
+    return bool(
+        "max-age" in directives
+        or "Expires" in response.headers
+        or "ETag" in response.headers
+        or "Last-Modified" in response.headers
+    )
+
+
+class HttpCache:
+    """Directory of stored GET responses, keyed by URL."""
+
+    def __init__(self, root: Optional[pathlib.Path] = None, max_stale: Optional[float] = None) -> None:
+        self._root = root
+        self.max_stale = max_stale
+
+    @property
+    def root(self) -> pathlib.Path:
+        return self._root or cache_dir() / "http"
+
+    def path_for(self, url: str) -> pathlib.Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / key[:2] / key
+
+    def load(self, url: str) -> Optional[CacheEntry]:
+        """Return the stored response for url, if there is a readable one."""
+        try:
+            with self.path_for(url).open("rb") as handle:
+                metadata = json.loads(handle.readline())
+                body = handle.read()
+            entry = CacheEntry(**metadata, body=body)
+        except (OSError, ValueError, TypeError):
+            return None
+        return entry if entry.url == url else None
+
+    def save(self, entry: CacheEntry) -> None:
+        """Store entry as one line of JSON metadata followed by the body."""
+        metadata = asdict(entry)
+        del metadata["body"]
+        with atomic_writer(self.path_for(entry.url)) as handle:
+            handle.write(json.dumps(metadata).encode("utf-8") + b"\n")
+            handle.write(entry.body)
+
+    def get(
+        self,
+        url: str,
+        request_headers: Mapping[str, str],
+        send: Callable[[Dict[str, str]], requests.Response],
+        params: Optional[Mapping] = None,
+        on_hit: Optional[Callable[[], None]] = None,
+    ) -> requests.Response:
+        """Answer a GET from the cache, or send it with send(headers) and store the response.
+
+        A request carrying its own If-None-Match or If-Modified-Since is
+        answered with a 304 if the usable stored response matches them.
+        """
+        url = request_url(url, params)
+        directives = parse_cache_control(CaseInsensitiveDict(request_headers).get("Cache-Control"))
+        entry = None if "no-cache" in directives else self.load(url)
+        if entry and not entry.matches(request_headers):
+            entry = None
+
+        conditional = any(name.lower() in {"if-none-match", "if-modified-since"}
+                          for name in request_headers)
+        if entry and entry.usable(time.time(), self.max_stale):
+            if on_hit:
+                on_hit()
+            return entry.to_response(not_modified=conditional and entry.satisfies(request_headers))
+
+        headers = dict(request_headers)
+        if entry and not conditional:
+            headers.update(conditional_headers(entry.validators()))
+
+        request_time = time.time()
+        response = send(headers)
+        response_time = time.time()
+
+        if response.status_code == 304 and entry:
+            etag = response.headers.get("ETag")
+            if not etag or etag == entry.header("ETag"):
+                entry = entry.refreshed(response, request_time, response_time)
+                self.save(entry)
+                if not conditional:
+                    return entry.to_response()
+            return response
+
+        if is_storable(response, request_headers):
+            self.save(CacheEntry.from_response(
+                url, response, request_headers, request_time, response_time))
+        return response
+
+
+def default_max_stale() -> Optional[float]:
+    """Read the HTTP_MAX_STALE environment variable, in the --max-stale format."""
+    value = os.environ.get("HTTP_MAX_STALE")
+    if not value:
+        return None
+    if value.lower() in {"any", "inf"}:
+        return math.inf
+    return max_stale_seconds(value)
+
+
+http_cache = HttpCache(max_stale=default_max_stale())
@@ -0,0 +1,331 @@
+"""Shared pooled HTTP client for the import scripts."""
+
+import argparse
+import math
+import os
+import pathlib
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .cache import use_state_dirs
+from .cassettes import CassetteStore, RecordingAdapter, ReplayAdapter
+from .http_cache import HttpCache, conditional_headers, http_cache, max_stale_seconds  # noqa: F401
+
+DEFAULT_TIMEOUT = 30
+# Number of hosts to keep pools for, and keep-alive connections per host
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "10"))
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+}
+IMAGE_ACCEPT = "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
+
+# Hosts (and their subdomains) that only serve images with a matching Referer
+REFERER_RULES: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (("goodreads.com", "gr-assets.com"), "https://www.goodreads.com/"),
+    (("medium.com",), "https://medium.com/"),
+)
+
+
+def default_retries() -> Retry:
+    """Retry connection errors and transient statuses with backoff."""
+    return Retry(
+        total=3,
+        connect=3,
+        read=1,
+        status=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+class ConnectionStats:
+    """Thread-safe counters of completed requests and connections opened.
+
+    Requests answered from cassettes by a replay count as replayed: they
+    never used a connection, opened or reused.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.opened = 0
+        self.cached = 0
+        self.replayed = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.opened += 1
+
+    def record_cache_hit(self) -> None:
+        with self._lock:
+            self.cached += 1
+
+    def record_replay(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.replayed += 1
+
+    @property
+    def reused(self) -> int:
+        """Requests that were sent over an already open connection."""
+        return max(self.requests - self.replayed - self.opened, 0)
+
+    def summary(self) -> str:
+        if self.replayed:
+            return (f"{self.requests} requests, {self.replayed} replayed from cassettes, "
+                    f"{self.cached} answered from cache")
+        return (f"{self.requests} requests, {self.opened} connections opened, "
+                f"{self.reused} reused, {self.cached} answered from cache")
+
+
+connection_stats = ConnectionStats()
+
+
+def counting_pool(pool_class):
+    """Return a connection pool class that records activity in connection_stats."""
+
+    class CountingConnection(pool_class.ConnectionCls):
+        def connect(self):
+            result = super().connect()
+            connection_stats.record_connection()
+            return result
+
+    class CountingPool(pool_class):
+        ConnectionCls = CountingConnection
+
+        def _make_request(self, *args, **kwargs):
+            response = super()._make_request(*args, **kwargs)
+            connection_stats.record_request()
+            return response
+
+    CountingPool.__name__ = f"Counting{pool_class.__name__}"
+    return CountingPool
+
+
+COUNTING_POOL_CLASSES = {
+    "http": counting_pool(HTTPConnectionPool),
+    "https": counting_pool(HTTPSConnectionPool),
+}
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose per-host pools count opened and reused connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = COUNTING_POOL_CLASSES
+
+
+def response_validators(response: requests.Response) -> Dict[str, str]:
+    """Return the ETag/Last-Modified validators a response can be revalidated with."""
+    validators: Dict[str, str] = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
+
+
+def referer_for(url: str) -> Optional[str]:
+    """Return the Referer header required by the URL's host, if any."""
+    host = (urlsplit(url).hostname or "").lower()
+    for domains, referer in REFERER_RULES:
+        for domain in domains:
+            if host == domain or host.endswith(f".{domain}"):
+                return referer
+    return None
+
+
+class HttpClient:
+    """requests.Session wrapper with keep-alive pools, retries, default timeouts and an HTTP cache.
+
+    Plain GET requests go through cache; streamed downloads bypass it, as
+    images are kept in the blob store instead.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = POOL_CONNECTIONS,
+        pool_maxsize: int = POOL_MAXSIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: Optional[Retry] = None,
+        cache: Optional[HttpCache] = None,
+        adapter: Optional[BaseAdapter] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(BROWSER_HEADERS)
+        adapter = adapter or PooledAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries or default_retries(),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        """Send a request with the client's defaults applied."""
+        merged_headers: Dict[str, str] = {}
+        referer = referer_for(url)
+        if referer:
+            merged_headers["Referer"] = referer
+        merged_headers.update(headers or {})
+        kwargs.setdefault("timeout", self.timeout)
+        if self.cache is None or method != "GET" or kwargs.get("stream"):
+            return self.session.request(method, url, headers=merged_headers, **kwargs)
+
+        params = kwargs.pop("params", None)
+        return self.cache.get(
+            url,
+            {**self.session.headers, **merged_headers},
+            lambda send_headers: self.session.request(
+                method, url, params=params, headers=send_headers, **kwargs),
+            params=params,
+            on_hit=connection_stats.record_cache_hit,
+        )
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+
+@dataclass
+class HttpOptions:
+    """How the process-wide client reaches the network, set before its first request."""
+
+    record_dir: Optional[pathlib.Path] = None
+    replay_dir: Optional[pathlib.Path] = None
+    replay_latency: bool = False
+
+    @property
+    def cassette_dir(self) -> Optional[pathlib.Path]:
+        """Return the directory being recorded to or replayed from, if any."""
+        return self.replay_dir or self.record_dir
+
+
+def env_path(name: str) -> Optional[pathlib.Path]:
+    value = os.environ.get(name)
+    return pathlib.Path(value) if value else None
+
+
+http_options = HttpOptions(
+    record_dir=env_path("HTTP_RECORD"),
+    replay_dir=env_path("HTTP_REPLAY"),
+    replay_latency=os.environ.get("HTTP_REPLAY_LATENCY", "") not in ("", "0"),
+)
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+
+def build_client(options: HttpOptions) -> HttpClient:
+    """Create a client that replays cassettes, records them, or uses the network and HTTP cache.
+
+    The HTTP cache is left out while recording or replaying, so every
+    request the scripts make ends up in the cassettes.
+    """
+    if options.replay_dir:
+        return HttpClient(adapter=ReplayAdapter(
+            CassetteStore(options.replay_dir),
+            latency=options.replay_latency,
+            on_request=connection_stats.record_replay,
+        ))
+    if options.record_dir:
+        network = PooledAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=POOL_MAXSIZE,
+            max_retries=default_retries(),
+        )
+        return HttpClient(adapter=RecordingAdapter(CassetteStore(options.record_dir), network))
+    return HttpClient(cache=http_cache)
+
+
+def get_client() -> HttpClient:
+    """Return the process-wide HTTP client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_client(http_options)
+        return _client
+
+
+def add_http_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the HTTP cache and record/replay options shared by the import scripts."""
+    group = parser.add_argument_group("HTTP")
+    group.add_argument(
+        "--max-stale",
+        nargs="?",
+        const=math.inf,
+        type=max_stale_seconds,
+        metavar="AGE",
+        help="Serve cached HTTP responses up to AGE (e.g. 300, 30m, 12h, 7d) past their expiry without a request; any age if AGE is omitted",
+    )
+    modes = group.add_mutually_exclusive_group()
+    modes.add_argument(
+        "--record",
+        type=pathlib.Path,
+        metavar="DIR",
+        help="Save every HTTP request and response, images included, as cassettes in DIR",
+    )
+    modes.add_argument(
+        "--replay",
+        type=pathlib.Path,
+        metavar="DIR",
+        help="Answer HTTP requests from the cassettes in DIR without network access",
+    )
+    group.add_argument(
+        "--replay-latency",
+        action="store_true",
+        help="With --replay, wait as long as each response took when it was recorded",
+    )
+
+
+def use_scratch_state(directory: pathlib.Path) -> None:
+    """Run with empty stores and an empty blog directory under directory.
+
+    Recording and replaying both start from nothing, so a replay makes the
+    same requests as its recording whatever .cache and blog/ hold, and
+    neither is written to. The output is kept until the next run.
+    """
+    shutil.rmtree(directory, ignore_errors=True)
+    use_state_dirs(directory / "cache", directory / "blog")
+
+
+def apply_http_arguments(args: argparse.Namespace) -> None:
+    """Configure the HTTP cache and client from the options added by add_http_arguments.
+
+    Recorded and replayed runs keep their state in a state/ directory next
+    to the cassettes.
+    """
+    global _client
+    if args.max_stale is not None:
+        http_cache.max_stale = args.max_stale
+    if args.record or args.replay:
+        http_options.record_dir = args.record
+        http_options.replay_dir = args.replay
+    if args.replay_latency:
+        http_options.replay_latency = True
+    if http_options.cassette_dir:
+        use_scratch_state(http_options.cassette_dir / "state")
+    with _client_lock:
+        _client = None
@@ -0,0 +1,93 @@
+"""Per-directory record of which feed entries produced which files."""
+
+import hashlib
+import json
+import pathlib
+import re
+from typing import Any, Iterator, Optional
+
+from .cache import ROOT_DIR, JsonStore, cache_dir
+
+
+def normalize_entry(value: Any) -> Any:
+    """Strip surrounding whitespace from every string in a feed entry."""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(key): normalize_entry(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_entry(item) for item in value]
+    return value
+
+
+def entry_digest(entry: Any) -> str:
+    """Return a stable hash of a normalized feed entry."""
+    payload = json.dumps(normalize_entry(entry), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def manifest_name(directory: pathlib.Path) -> str:
+    """Name a directory's manifest after its path inside the repository."""
+    directory = directory.resolve()
+    try:
+        relative = directory.relative_to(ROOT_DIR).as_posix()
+    except ValueError:
+        relative = hashlib.sha256(str(directory).encode("utf-8")).hexdigest()[:16]
+    return re.sub(r"[^\w.-]+", "-", relative).strip("-")
+
+
+class SyncManifest:
+    """Entry hashes and generated files for one output directory.
+
+    Each record is keyed by a stable id from the feed (book_id, post URL)
+    and holds the entry's hash with the content file and image it produced.
+    The fingerprint of the sync settings is mixed into every hash, so
+    changing the settings makes every entry look new.
+    """
+
+    def __init__(self, directory: pathlib.Path, fingerprint: str = "", assets_dir: Optional[pathlib.Path] = None) -> None:
+        self.directory = directory
+        self.fingerprint = fingerprint
+        # Recorded image paths are relative to assets_dir; without one they aren't checked
+        self.assets_dir = assets_dir
+        self.store = JsonStore(manifest_name(directory), cache_dir() / "manifests")
+
+    def _digest(self, digest: str) -> str:
+        if not self.fingerprint:
+            return digest
+        return hashlib.sha256(f"{self.fingerprint}:{digest}".encode("utf-8")).hexdigest()
+
+    def is_unchanged(self, key: str, digest: str) -> bool:
+        """Return True if the entry was synced before with exactly this content.
+
+        An entry whose content file or image has since been deleted counts as
+        changed, so it is written again.
+        """
+        record = self.store.get(key)
+        if not record or record.get("digest") != self._digest(digest):
+            return False
+        if not record.get("file") or not (self.directory / record["file"]).exists():
+            return False
+        image = record.get("image")
+        return not (image and self.assets_dir and not (self.assets_dir / image).exists())
+
+    def record(self, key: str, digest: str, output: pathlib.Path, image: Optional[str] = None) -> None:
+        """Remember that the entry produced output, and image if it has one."""
+        try:
+            output_name = output.relative_to(self.directory).as_posix()
+        except ValueError:
+            output_name = output.as_posix()
+        self.store.set(key, {
+            "digest": self._digest(digest),
+            "file": output_name,
+            "image": image,
+        })
+
+    def forget(self, key: str) -> None:
+        self.store.delete(key)
+
+    def keys(self) -> Iterator[str]:
+        return (key for key, _ in self.store.items())
+
+    def save(self) -> None:
+        self.store.save()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Move downloaded images into the blob store and link duplicates to one copy."""
+
+import argparse
+import pathlib
+
+from common.blobs import blob_store, format_bytes
+from common.cache import BLOG_DIR
+
+# Only directories the import scripts download into. Images written in place
+# by other tools, such as slides, must not become links into the store.
+DEFAULT_IMAGE_DIRS = [
+    BLOG_DIR / "assets/images/books",
+    BLOG_DIR / "assets/images/writing",
+]
+
+
+def main() -> None:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Deduplicate downloaded images through the blob store")
+    parser.add_argument(
+        "directories",
+        nargs="*",
+        type=pathlib.Path,
+        default=DEFAULT_IMAGE_DIRS,
+        help="Directories to scan (default: book covers and post images)",
+    )
+    args = parser.parse_args()
+
+    paths = []
+    for directory in args.directories:
+        if directory.exists():
+            paths.extend(sorted(path for path in directory.rglob("*") if path.is_file()))
+
+    saved = blob_store.dedupe(paths)
+    stats = blob_store.stats
+    print(f"Scanned {len(paths)} images: {stats.stored} newly stored, {stats.reused} duplicates linked.")
+    print(f"Deduplication saved {format_bytes(saved)}.")
+
+
+if __name__ == "__main__":
+    main()
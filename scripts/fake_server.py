@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""Serve synthetic Goodreads, Medium, Dev.to and cover provider responses for load testing.
+
+Every response is generated from the request path and a seed, so the same
+server settings always serve the same shelves, posts and covers. Latency,
+server errors and 429s are added at configurable rates. Point the import
+scripts at the server with the environment variables it prints on startup.
+"""
+
+import argparse
+import hashlib
+import json
+import pathlib
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote_plus, urlsplit
+from xml.sax.saxutils import escape
+
+AUTHORS = ["Ursula Le Guin", "Italo Calvino", "Octavia Butler", "Jorge Luis Borges",
+           "Ted Chiang", "N. K. Jemisin", "Stanisław Lem", "Kazuo Ishiguro"]
+TAGS = ["python", "architecture", "leadership", "web", "devops", "books"]
+SHELF_TAGS = ["sci-fi", "non-fiction", "essays", "classics", "tech"]
+GOODREADS_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S %z"
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+IMAGE_HEADER = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_STATE_DIR = ROOT_DIR / ".cache/fake-server"
+
+
+@dataclass
+class Settings:
+    """What the server generates and how badly it behaves."""
+
+    base_url: str
+    seed: int = 1
+    books: int = 1000
+    page_size: int = 100
+    posts: int = 50
+    feed_cover_rate: float = 0.8
+    openlibrary_rate: float = 0.6
+    google_rate: float = 0.5
+    image_bytes: int = 16 * 1024
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    max_age: int = 0
+
+
+class Stats:
+    """Thread-safe count of requests per route and status."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def record(self, route: str, status: int) -> None:
+        with self._lock:
+            self.counts[f"{route} {status}"] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+
+
+def chance(settings: Settings, *parts: object) -> float:
+    """Return a stable number in [0, 1) for the seed and parts."""
+    key = repr((settings.seed,) + parts).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big") / 2 ** 64
+
+
+def book_isbn(settings: Settings, shelf: str, index: int) -> str:
+    digits = int(chance(settings, "isbn", shelf, index) * 10 ** 10)
+    return f"978{digits:010d}"
+
+
+def book_id(shelf: str, index: int) -> int:
+    return int(hashlib.sha256(f"{shelf}:{index}".encode("utf-8")).hexdigest()[:7], 16)
+
+
+def goodreads_item(settings: Settings, shelf: str, index: int) -> str:
+    """Render one list_rss item with the fields the book sync reads."""
+    identifier = book_id(shelf, index)
+    title = f"Synthetic Book {index}: {shelf.replace('-', ' ').title()}"
+    author = AUTHORS[index % len(AUTHORS)]
+    added = EPOCH - timedelta(days=index)
+    read_at = format_datetime(added + timedelta(days=7)) if index % 3 else ""
+    image = ""
+    if chance(settings, "feed-cover", shelf, index) < settings.feed_cover_rate:
+        image = f"{settings.base_url}/images/books/{identifier}.jpg"
+    tags = ",".join([shelf] + SHELF_TAGS[index % len(SHELF_TAGS):][:2])
+    fields = {
+        "title": title,
+        "link": f"{settings.base_url}/book/show/{identifier}?utm_medium=api&utm_source=rss",
+        "guid": f"{settings.base_url}/review/show/{identifier}",
+        "book_id": str(identifier),
+        "isbn": book_isbn(settings, shelf, index),
+        "author_name": author,
+        "user_rating": str(index % 6),
+        "user_read_at": read_at,
+        "user_date_added": added.strftime(GOODREADS_DATE_FORMAT),
+        "user_shelves": tags,
+        "book_image_url": image,
+        "book_large_image_url": image,
+        "pubDate": format_datetime(added),
+    }
+    body = "".join(f"<{key}>{escape(value)}</{key}>" for key, value in fields.items())
+    return f"<item>{body}</item>"
+
+
+def goodreads_feed(settings: Settings, query: Dict[str, List[str]]) -> bytes:
+    """Render one page of a shelf."""
+    shelf = query.get("shelf", ["read"])[0]
+    page = max(int(query.get("page", ["1"])[0] or 1), 1)
+    # Like Goodreads, honor per_page up to the server's page size
+    per_page = int(query.get("per_page", [settings.page_size])[0] or settings.page_size)
+    page_size = min(per_page, settings.page_size)
+    start = (page - 1) * page_size
+    stop = min(start + page_size, settings.books)
+    items = "".join(goodreads_item(settings, shelf, index) for index in range(start, stop))
+    return rss(f"Goodreads shelf {shelf}", items)
+
+
+def rss(title: str, items: str) -> bytes:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"'
+        ' xmlns:media="http://search.yahoo.com/mrss/">'
+        f"<channel><title>{escape(title)}</title>{items}</channel></rss>"
+    ).encode("utf-8")
+
+
+def medium_body(settings: Settings, index: int) -> str:
+    """Render an article body shaped like Medium's content:encoded."""
+    sections = [f'<figure><img alt="Cover {index}" src="{settings.base_url}/images/medium/{index}.png"></figure>']
+    for part in range(3 + index % 12):
+        sections.append(
+            f"<h{3 + part % 2}>Part {part}</h{3 + part % 2}>"
+            f"<p>Paragraph {part} of post {index} with <a href=\"https://example.com/{part}\">a link</a>, "
+            f"<strong>bold</strong> and <code>code_{part}</code>.</p>"
+            f"<pre>for item in range({part}):\n    print(item)</pre>"
+            "<ul><li>first</li><li>second</li></ul><blockquote>A quote.</blockquote>")
+    if index % 4 == 1:
+        sections.append(
+            f'<hr><p><em>Originally published at <a href="https://blog.example.com/post-{index}/">'
+            f"blog.example.com</a> on March {1 + index % 28}, 2023.</em></p>")
+    sections.append('<img src="https://medium.com/_/stat?event=post.clientViewed" width="1" height="1">')
+    return "".join(sections)
+
+
+def medium_feed(settings: Settings, user: str) -> bytes:
+    items = []
+    for index in range(settings.posts):
+        published = EPOCH - timedelta(days=index * 3)
+        tags = "".join(f"<category>{tag}</category>" for tag in TAGS[index % 3:index % 3 + 2])
+        items.append(
+            f"<item><title>Synthetic Medium Post {index}</title>"
+            f"<link>{settings.base_url}/@{user}/synthetic-medium-post-{index}-{index:04x}?source=rss</link>"
+            f"<guid>{settings.base_url}/p/{index:04x}</guid>{tags}"
+            f"<pubDate>{format_datetime(published)}</pubDate>"
+            f"<content:encoded><![CDATA[{medium_body(settings, index)}]]></content:encoded></item>")
+    return rss(f"Stories by {user} on Medium", "".join(items))
+
+
+def devto_slug(index: int) -> str:
+    return f"synthetic-devto-post-{index}-{index:04x}"
+
+
+def devto_collection(index: int) -> Optional[int]:
+    """Put every fifth post from the tenth on into a series."""
+    return 1000 + index // 10 if index >= 10 and index % 5 == 0 else None
+
+
+def devto_feed(settings: Settings, user: str) -> bytes:
+    items = []
+    for index in range(settings.posts):
+        published = EPOCH - timedelta(days=index * 2)
+        tags = "".join(f"<category>{tag}</category>" for tag in TAGS[index % 4:index % 4 + 2])
+        items.append(
+            f"<item><title>Synthetic Dev.to Post {index}</title>"
+            f"<link>{settings.base_url}/{user}/{devto_slug(index)}</link>"
+            f"<guid>{settings.base_url}/{user}/{devto_slug(index)}</guid>{tags}"
+            f"<pubDate>{format_datetime(published)}</pubDate>"
+            f"<description>Post {index}</description>"
+            f'<media:thumbnail url="{settings.base_url}/images/devto/thumb-{index}.png"/></item>')
+    return rss(f"DEV Community: {user}", "".join(items))
+
+
+def devto_article(settings: Settings, user: str, slug: str) -> Optional[dict]:
+    match = re.fullmatch(r"synthetic-devto-post-(\d+)-[0-9a-f]+", slug)
+    if not match or int(match.group(1)) >= settings.posts:
+        return None
+    index = int(match.group(1))
+    paragraphs = "\n\n".join(
+        f"## Part {part}\n\nParagraph {part} of post {index}.\n\n```python\nprint({part})\n```"
+        for part in range(3 + index % 10))
+    return {
+        "id": 500000 + index,
+        "title": f"Synthetic Dev.to Post {index}",
+        "body_markdown": paragraphs,
+        "cover_image": f"{settings.base_url}/images/devto/cover-{index}.png" if index % 3 else None,
+        "tag_list": TAGS[index % 4:index % 4 + 2],
+        "collection_id": devto_collection(index),
+        "published_at": (EPOCH - timedelta(days=index * 2)).isoformat(),
+        "user": {"username": user},
+    }
+
+
+def devto_articles(settings: Settings) -> List[dict]:
+    return [{
+        "id": 500000 + index,
+        "collection_id": devto_collection(index),
+        "published_at": (EPOCH - timedelta(days=index * 2)).isoformat(),
+    } for index in range(settings.posts)]
+
+
+def openlibrary_has(settings: Settings, isbn: str) -> bool:
+    return chance(settings, "openlibrary", isbn) < settings.openlibrary_rate
+
+
+def google_has(settings: Settings, query: str) -> bool:
+    return chance(settings, "google", query) < settings.google_rate
+
+
+def openlibrary_books(settings: Settings, query: Dict[str, List[str]]) -> dict:
+    records = {}
+    for bibkey in query.get("bibkeys", [""])[0].split(","):
+        isbn = bibkey.partition(":")[2]
+        if isbn and openlibrary_has(settings, isbn):
+            records[bibkey] = {
+                "title": f"Book {isbn}",
+                "cover": {
+                    "small": f"{settings.base_url}/b/isbn/{isbn}-S.jpg",
+                    "medium": f"{settings.base_url}/b/isbn/{isbn}-M.jpg",
+                    "large": f"{settings.base_url}/b/isbn/{isbn}-L.jpg",
+                },
+            }
+    return records
+
+
+def openlibrary_search(settings: Settings, query: Dict[str, List[str]]) -> dict:
+    text = query.get("q", [""])[0]
+    if not google_has(settings, f"search:{text}"):
+        return {"numFound": 0, "docs": []}
+    cover_id = int(chance(settings, "cover-id", text) * 10 ** 7)
+    return {"numFound": 1, "docs": [{"title": text, "cover_i": cover_id}]}
+
+
+def google_volumes(settings: Settings, query: Dict[str, List[str]]) -> dict:
+    text = query.get("q", [""])[0]
+    if not google_has(settings, text):
+        return {"kind": "books#volumes", "totalItems": 0}
+    name = quote_plus(text)
+    return {"kind": "books#volumes", "totalItems": 1, "items": [{"volumeInfo": {
+        "title": text,
+        "imageLinks": {
+            "thumbnail": f"{settings.base_url}/images/google/{name}-thumb.jpg",
+            "large": f"{settings.base_url}/images/google/{name}.jpg",
+        },
+    }}]}
+
+
+def image_bytes(settings: Settings, path: str) -> bytes:
+    """Return stable, distinct bytes for an image path."""
+    seed = hashlib.sha256(f"{settings.seed}:{path}".encode("utf-8")).digest()
+    repeats = max(settings.image_bytes - len(IMAGE_HEADER), 0) // len(seed) + 1
+    return (IMAGE_HEADER + seed * repeats)[:max(settings.image_bytes, len(IMAGE_HEADER))]
+
+
+def route(settings: Settings, path: str, query: Dict[str, List[str]]) -> Tuple[str, int, str, bytes]:
+    """Map a request to (route name, status, content type, body)."""
+    parts = [part for part in path.split("/") if part]
+    rss_type = "application/rss+xml; charset=utf-8"
+    json_type = "application/json; charset=utf-8"
+
+    if parts[:2] == ["review", "list_rss"]:
+        return "goodreads", 200, rss_type, goodreads_feed(settings, query)
+    if len(parts) == 2 and parts[0] == "feed":
+        if parts[1].startswith("@"):
+            return "medium-feed", 200, rss_type, medium_feed(settings, parts[1][1:])
+        return "devto-feed", 200, rss_type, devto_feed(settings, parts[1])
+    if parts[:2] == ["api", "articles"]:
+        if len(parts) == 2:
+            return "devto-articles", 200, json_type, json.dumps(devto_articles(settings)).encode("utf-8")
+        article = devto_article(settings, parts[2], parts[3]) if len(parts) == 4 else None
+        if article is None:
+            return "devto-article", 404, json_type, b'{"error":"not found","status":404}'
+        return "devto-article", 200, json_type, json.dumps(article).encode("utf-8")
+    if len(parts) == 3 and parts[1] == "series":
+        title = f"Synthetic Series {parts[2]} Series' Articles - DEV Community"
+        return "devto-series", 200, "text/html; charset=utf-8", f"<html><head><title>{title}</title></head></html>".encode("utf-8")
+    if parts == ["api", "books"]:
+        return "openlibrary-books", 200, json_type, json.dumps(openlibrary_books(settings, query)).encode("utf-8")
+    if parts == ["search.json"]:
+        return "openlibrary-search", 200, json_type, json.dumps(openlibrary_search(settings, query)).encode("utf-8")
+    if parts[:3] == ["books", "v1", "volumes"]:
+        return "google-books", 200, json_type, json.dumps(google_volumes(settings, query)).encode("utf-8")
+    if parts[:2] == ["b", "isbn"] and len(parts) == 3:
+        isbn = parts[2].split("-")[0]
+        if not openlibrary_has(settings, isbn):
+            return "openlibrary-cover", 404, "text/plain", b"not found"
+        return "openlibrary-cover", 200, "image/jpeg", image_bytes(settings, path)
+    if parts[:1] in (["images"], ["b"]):
+        return "image", 200, "image/jpeg", image_bytes(settings, path)
+    return "unknown", 404, "text/plain", b"not found"
+
+
+def make_handler(settings: Settings, stats: Stats, rng: random.Random, rng_lock: threading.Lock):
+    last_modified = format_datetime(EPOCH, usegmt=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def fault(self) -> Optional[int]:
+            """Sleep for the configured latency, then maybe pick an error status."""
+            with rng_lock:
+                delay = max(settings.latency + rng.uniform(-settings.jitter, settings.jitter), 0)
+                roll = rng.random()
+            if delay:
+                time.sleep(delay)
+            if roll < settings.rate_limit_rate:
+                return 429
+            if roll < settings.rate_limit_rate + settings.error_rate:
+                return 503
+            return None
+
+        def respond(self, include_body: bool) -> None:
+            split = urlsplit(self.path)
+            name, status, content_type, body = route(settings, split.path, parse_qs(split.query))
+
+            error = self.fault()
+            if error:
+                stats.record(name, error)
+                self.send_response(error)
+                if error == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+            stats.record(name, status)
+            self.send_response(status)
+            if status in (200, 304):
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Cache-Control", f"max-age={settings.max_age}")
+            if status != 304:
+                self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if include_body:
+                self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if urlsplit(self.path).path == "/__stats":
+                body = json.dumps(stats.snapshot(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.respond(include_body=True)
+
+        def do_HEAD(self) -> None:
+            self.respond(include_body=False)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+def environment(base_url: str, state_dir: pathlib.Path) -> Dict[str, str]:
+    """Return the environment variables that point the import scripts at the server.
+
+    The scripts' caches and the content they write go under state_dir, so
+    the synthetic data never mixes with the real .cache and blog/.
+    """
+    return {
+        "CACHE_DIR": str(state_dir / "cache"),
+        "BLOG_DIR": str(state_dir / "blog"),
+        "GOODREADS_FEED": f"{base_url}/review/list_rss/1?key=synthetic",
+        "DEFAULT_MEDIUM_FEED": f"{base_url}/feed/@yrizos",
+        "DEFAULT_DEVTO_FEED": f"{base_url}/feed/yrizos",
+        "DEVTO_URL": base_url,
+        "GOOGLE_BOOKS_API": f"{base_url}/books/v1/volumes",
+        "OPENLIBRARY_URL": base_url,
+        "OPENLIBRARY_COVERS_URL": base_url,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Serve synthetic Goodreads, Medium, Dev.to and cover provider responses")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the generated data (default: 1)")
+    parser.add_argument("--books", type=int, default=1000, help="Books on every shelf (default: 1000)")
+    parser.add_argument("--page-size", type=int, default=100, help="Most books per shelf feed page, whatever per_page asks for (default: 100)")
+    parser.add_argument("--posts", type=int, default=50, help="Posts in each Medium and Dev.to feed (default: 50)")
+    parser.add_argument("--feed-cover-rate", type=float, default=0.8,
+                        help="Share of books with a cover in the shelf feed (default: 0.8)")
+    parser.add_argument("--openlibrary-rate", type=float, default=0.6,
+                        help="Share of ISBNs Open Library has a cover for (default: 0.6)")
+    parser.add_argument("--google-rate", type=float, default=0.5,
+                        help="Share of Google Books and Open Library searches that find a cover (default: 0.5)")
+    parser.add_argument("--image-bytes", type=int, default=16 * 1024, help="Size of every image (default: 16384)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random seconds added to or taken from the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Share of requests answered with a 429 and Retry-After")
+    parser.add_argument("--max-age", type=int, default=0,
+                        help="Cache-Control max-age of every response, in seconds (default: 0)")
+    parser.add_argument("--state-dir", type=pathlib.Path, default=DEFAULT_STATE_DIR,
+                        help=f"Where the scripts keep their caches and write content (default: {DEFAULT_STATE_DIR.relative_to(ROOT_DIR)})")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Main entry point."""
+    args = parse_args()
+    base_url = f"http://{args.host}:{args.port}"
+    settings = Settings(
+        base_url=base_url,
+        seed=args.seed,
+        books=args.books,
+        page_size=args.page_size,
+        posts=args.posts,
+        feed_cover_rate=args.feed_cover_rate,
+        openlibrary_rate=args.openlibrary_rate,
+        google_rate=args.google_rate,
+        image_bytes=args.image_bytes,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_age=args.max_age,
+    )
+    stats = Stats()
+    handler = make_handler(settings, stats, random.Random(args.seed), threading.Lock())
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+
+    print(f"Serving synthetic feeds on {base_url} (request counts at {base_url}/__stats)")
+    print("Point the import scripts at it with:\n")
+    for name, value in environment(base_url, args.state_dir.resolve()).items():
+        print(f"export {name}='{value}'")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(stats.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
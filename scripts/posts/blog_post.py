@@ -2,7 +2,7 @@
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 
 @dataclass
@@ -11,9 +11,20 @@ class BlogPost:
     slug: str
     date: datetime
     original_url: str
-    markdown_body: str
+    markdown_body: str = ""
     tags: List[str] = field(default_factory=list)
     image_url: Optional[str] = None
     image_alt: str = ""
     series_title: Optional[str] = None
     series_order: Optional[int] = None
+    source_url: Optional[str] = None
+    entry_digest: Optional[str] = None
+    # Fills in the body, image and series once the post is chosen for import
+    loader: Optional[Callable[["BlogPost"], None]] = field(
+        default=None, repr=False, compare=False)
+
+    def load(self) -> None:
+        """Run the deferred part of parsing, at most once."""
+        if self.loader is not None:
+            loader, self.loader = self.loader, None
+            loader(self)
@@ -2,30 +2,47 @@
 
 import argparse
 import json
+import os
 import pathlib
 import re
-from datetime import datetime
-from typing import Callable, Iterable, List, Optional
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
 from urllib.parse import urlsplit, urlunsplit
 
-import requests
 from rich.console import Console
 from rich.theme import Theme
 
+from common.blobs import blob_store
+from common.cache import blog_dir
+from common.downloads import download_image, map_concurrently
+from common.files import write_if_changed
+from common.manifest import SyncManifest, entry_digest
+from common.http_client import add_http_arguments, apply_http_arguments, connection_stats
+
 from .blog_post import BlogPost
 
 console = Console(theme=Theme(
     {"prompt": "bold cyan", "choice": "bold green", "error": "bold red"}))
 
-DEFAULT_MEDIUM_FEED = "https://medium.com/feed/@yrizos"
-DEFAULT_DEVTO_FEED = "https://dev.to/feed/yrizos"
+DEFAULT_MEDIUM_FEED = os.environ.get("DEFAULT_MEDIUM_FEED", "https://medium.com/feed/@yrizos")
+DEFAULT_DEVTO_FEED = os.environ.get("DEFAULT_DEVTO_FEED", "https://dev.to/feed/yrizos")
 
-ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent.parent
-BLOG_DIR = ROOT_DIR / "blog"
-POSTS_DIR = BLOG_DIR / "content/writing"
-IMAGES_DIR = BLOG_DIR / "assets/images/writing"
 WEB_IMAGE_PREFIX = pathlib.Path("images/writing")
 
+CANONICAL_URL_PATTERN = re.compile(r'^canonical_url\s*=\s*"([^"]*)"')
+
+
+def posts_dir() -> pathlib.Path:
+    """Return the directory posts are written to."""
+    return blog_dir() / "content/writing"
+
+
+def assets_dir() -> pathlib.Path:
+    """Return the Hugo assets directory post images are written under."""
+    return blog_dir() / "assets"
+
 
 def slugify(title: str) -> str:
     """Convert a title into a filesystem-friendly slug."""
@@ -40,6 +57,49 @@ def clean_url(url: str) -> str:
     return urlunsplit((split.scheme, split.netloc, split.path, "", ""))
 
 
+def entry_source(entry) -> Tuple[str, str]:
+    """Return the URL and hash a feed entry is tracked under in the sync manifest."""
+    return clean_url(entry.get("link") or ""), entry_digest(entry)
+
+
+class ImportedPosts:
+    """canonical_url and slug of every post already written to a directory."""
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.urls: Set[str] = set()
+        self.slugs: Set[str] = set()
+        if directory.is_dir():
+            for path in directory.glob("*.md"):
+                self.slugs.add(path.stem)
+                url = read_canonical_url(path)
+                if url:
+                    self.urls.add(clean_url(url))
+
+    def __len__(self) -> int:
+        return len(self.slugs)
+
+    def has(self, post: BlogPost) -> bool:
+        """Return True if the post's slug or either of its URLs is already imported."""
+        if post.slug in self.slugs:
+            return True
+        return any(clean_url(url) in self.urls
+                   for url in (post.original_url, post.source_url) if url)
+
+
+def read_canonical_url(path: pathlib.Path) -> Optional[str]:
+    """Return the canonical_url from a post's front matter, reading no further than the front matter."""
+    with path.open(encoding="utf-8") as handle:
+        if handle.readline().strip() != "+++":
+            return None
+        for line in handle:
+            if line.strip() == "+++":
+                break
+            match = CANONICAL_URL_PATTERN.match(line)
+            if match:
+                return match.group(1)
+    return None
+
+
 def parse_publish_date(raw_value: Optional[str], fallback: Optional[str], title: str) -> datetime:
     """Parse publication date from the feed entry."""
     from datetime import timezone
@@ -91,24 +151,6 @@ def to_toml_value(value) -> str:
     return json.dumps(value)
 
 
-def download_image(url: str, destination: pathlib.Path) -> None:
-    """Download the image for the post."""
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8",
-    })
-    
-    if "medium.com" in url or "cdn-images-1.medium.com" in url:
-        session.headers["Referer"] = "https://medium.com/"
-    
-    response = session.get(url, timeout=30)
-    response.raise_for_status()
-    destination.parent.mkdir(parents=True, exist_ok=True)
-    with destination.open("wb") as handle:
-        handle.write(response.content)
-
-
 def determine_image_filename(slug: str, image_url: str) -> str:
     """Determine a suitable image filename preserving the original extension when possible."""
     suffix = pathlib.Path(urlsplit(image_url).path).suffix.lower()
@@ -117,22 +159,34 @@ def determine_image_filename(slug: str, image_url: str) -> str:
     return f"{slug}{suffix}"
 
 
-def write_post(post: BlogPost) -> None:
-    """Write the Hugo content file and download the post image if available."""
-    POSTS_DIR.mkdir(parents=True, exist_ok=True)
+def write_post(post: BlogPost, manifest: Optional[SyncManifest] = None) -> bool:
+    """Write the Hugo content file and download the post image if available.
+
+    The post is recorded in manifest, if given, so an unchanged feed entry
+    is skipped next time.
 
-    post_path = POSTS_DIR / f"{post.slug}.md"
+    Returns:
+        bool: False if the content file already had the rendered content
+    """
+    directory = posts_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    post_path = directory / f"{post.slug}.md"
     image_web_path: Optional[pathlib.Path] = None
 
     if post.image_url:
         image_filename = determine_image_filename(post.slug, post.image_url)
-        image_path = IMAGES_DIR / image_filename
-        download_image(post.image_url, image_path)
+        image_path = assets_dir() / WEB_IMAGE_PREFIX / image_filename
+        download_image(post.image_url, image_path, revalidate=True)
         image_web_path = WEB_IMAGE_PREFIX / image_filename
 
     front_matter = build_front_matter(post, image_web_path)
-    post_path.write_text(
-        f"{front_matter}\n\n{post.markdown_body}\n", encoding="utf-8")
+    written = write_if_changed(
+        post_path, f"{front_matter}\n\n{post.markdown_body}\n")
+    if manifest and post.source_url and post.entry_digest:
+        manifest.record(post.source_url, post.entry_digest, post_path,
+                        image_web_path.as_posix() if image_web_path else None)
+    return written
 
 
 def prompt_for_post(post: BlogPost) -> str:
@@ -153,30 +207,237 @@ def prompt_for_post(post: BlogPost) -> str:
             "Please answer with 'yes', 'no', or 'exit'.", style="error")
 
 
-def process_posts(posts: Iterable[BlogPost]) -> None:
-    """Iterate through posts, prompting the user before writing each one."""
-    for post in posts:
-        decision = prompt_for_post(post)
-        if decision == "exit":
-            break
-        if decision == "no":
-            console.print(f"Skipping: {post.title}", style="choice")
-            continue
-        try:
-            write_post(post)
-            console.print(f"[green]Saved:[/green] {post.title}")
-        except Exception as err:  # noqa: BLE001
-            console.print(
-                f"Failed to save '{post.title}': {err}", style="error")
-
-
-def run(feed_fetcher: Callable[[str], List[BlogPost]], feed_url: str) -> None:
-    """Fetch posts from the selected feed and process them."""
-    posts = feed_fetcher(feed_url)
-    if not posts:
+def process_posts(posts: Iterable[BlogPost], manifest: Optional[SyncManifest] = None) -> int:
+    """Iterate through posts, prompting the user before writing each one.
+
+    Posts are only loaded in full once the user chooses to import them, and
+    answering "exit" closes posts so a lazy fetcher stops any queued work.
+
+    Returns:
+        int: the number of posts offered
+    """
+    offered = 0
+    try:
+        for post in posts:
+            offered += 1
+            decision = prompt_for_post(post)
+            if decision == "exit":
+                break
+            if decision == "no":
+                console.print(f"Skipping: {post.title}", style="choice")
+                continue
+            try:
+                post.load()
+                if write_post(post, manifest):
+                    console.print(f"[green]Saved:[/green] {post.title}")
+                else:
+                    console.print(f"Unchanged: {post.title}", style="choice")
+            except Exception as err:  # noqa: BLE001
+                console.print(
+                    f"Failed to save '{post.title}': {err}", style="error")
+    finally:
+        close = getattr(posts, "close", None)
+        if close:
+            close()
+    return offered
+
+
+@dataclass
+class BatchSelection:
+    """Which posts a non-interactive run imports."""
+
+    since: Optional[datetime] = None
+    pattern: Optional[Pattern[str]] = None
+    limit: Optional[int] = None
+
+    def select(self, posts: Iterable[BlogPost]) -> Iterator[BlogPost]:
+        """Yield the posts published since and matching pattern, stopping after limit."""
+        if self.limit == 0:
+            return
+        selected = 0
+        for post in posts:
+            if self.since and post.date < self.since:
+                continue
+            if self.pattern and not self.pattern.search(post.title):
+                continue
+            yield post
+            selected += 1
+            if self.limit is not None and selected >= self.limit:
+                return
+
+
+def import_post(post: BlogPost, manifest: Optional[SyncManifest] = None) -> Dict[str, Any]:
+    """Load and write a post without prompting.
+
+    Returns:
+        Dict[str, Any]: the post's entry in the batch summary
+    """
+    result: Dict[str, Any] = {
+        "title": post.title,
+        "slug": post.slug,
+        "url": post.original_url,
+    }
+    try:
+        post.load()
+        result["status"] = "saved" if write_post(post, manifest) else "unchanged"
+    except Exception as err:  # noqa: BLE001
+        result["status"] = "failed"
+        result["error"] = str(err)
+    return result
+
+
+def import_batch(
+    posts: Iterable[BlogPost],
+    selection: BatchSelection,
+    manifest: Optional[SyncManifest] = None,
+) -> List[Dict[str, Any]]:
+    """Import the selected posts on a worker pool, keeping feed order in the results."""
+    try:
+        return map_concurrently(
+            lambda post: import_post(post, manifest), selection.select(posts))
+    finally:
+        close = getattr(posts, "close", None)
+        if close:
+            close()
+
+
+def batch_summary(feed_url: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the machine-readable report of a batch run."""
+    counts = {status: sum(1 for result in results if result["status"] == status)
+              for status in ("saved", "unchanged", "failed")}
+    return {
+        "feed_url": feed_url,
+        "selected": len(results),
+        **counts,
+        "posts": results,
+        "images": {
+            "stored": blob_store.stats.stored,
+            "reused": blob_store.stats.reused,
+            "bytes_saved": blob_store.stats.bytes_saved,
+        },
+        "http": {
+            "requests": connection_stats.requests,
+            "connections_opened": connection_stats.opened,
+            "connections_reused": connection_stats.reused,
+            "cache_hits": connection_stats.cached,
+            "replayed": connection_stats.replayed,
+        },
+    }
+
+
+def run(
+    feed_fetcher: Callable[[str, Optional[SyncManifest], Optional[ImportedPosts]], Iterable[BlogPost]],
+    feed_url: str,
+    rebuild: bool = False,
+    include_imported: bool = False,
+    batch: Optional[BatchSelection] = None,
+) -> bool:
+    """Fetch posts from the selected feed and process them.
+
+    Entries already imported with the same content are skipped unless
+    rebuild is set, and posts that already have a file in posts_dir() are
+    skipped unless include_imported or rebuild is set. With batch, the
+    selected posts are imported without prompting and a JSON summary is
+    printed to stdout, with all other output on stderr.
+
+    Returns:
+        bool: False if a post in a batch run failed to import
+    """
+    if batch:
+        console.stderr = True
+    manifest = SyncManifest(posts_dir(), assets_dir=assets_dir())
+    imported = None if rebuild or include_imported else ImportedPosts(posts_dir())
+    posts = feed_fetcher(feed_url, None if rebuild else manifest, imported)
+
+    if batch:
+        results = import_batch(posts, batch, manifest)
+        manifest.save()
+        blob_store.save()
+        summary = batch_summary(feed_url, results)
+        print(json.dumps(summary, indent=2))
+        return not summary["failed"]
+
+    if not process_posts(posts, manifest):
         console.print("No posts found to process.", style="error")
-        return
-    process_posts(posts)
+        return True
+    manifest.save()
+    blob_store.save()
+    console.print(f"Images: {blob_store.stats.summary()}")
+    console.print(f"HTTP: {connection_stats.summary()}")
+    return True
+
+
+def parse_since(value: str) -> datetime:
+    """Parse a --since date as midnight UTC."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid date '{value}', expected YYYY-MM-DD") from None
+
+
+def parse_pattern(value: str) -> Pattern[str]:
+    """Compile a --match expression, matched case-insensitively against titles."""
+    try:
+        return re.compile(value, re.IGNORECASE)
+    except re.error as err:
+        raise argparse.ArgumentTypeError(
+            f"invalid regular expression '{value}': {err}") from None
+
+
+def non_negative_int(value: str) -> int:
+    """Parse a --limit count."""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"expected a number >= 0, got {value}")
+    return number
+
+
+def add_sync_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options shared by every source subcommand."""
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Offer every post again, ignoring the sync manifest",
+    )
+    parser.add_argument(
+        "--include-imported",
+        action="store_true",
+        help="Offer posts that already have a file in content/writing",
+    )
+    batch = parser.add_argument_group(
+        "batch mode", "Import without prompting and print a JSON summary; any of these options enables it")
+    batch.add_argument(
+        "--all",
+        action="store_true",
+        help="Import every post that passes the other filters",
+    )
+    batch.add_argument(
+        "--since",
+        type=parse_since,
+        metavar="DATE",
+        help="Only import posts published on or after DATE (YYYY-MM-DD)",
+    )
+    batch.add_argument(
+        "--match",
+        type=parse_pattern,
+        metavar="REGEX",
+        help="Only import posts whose title matches REGEX (case-insensitive)",
+    )
+    batch.add_argument(
+        "--limit",
+        type=non_negative_int,
+        metavar="N",
+        help="Import at most N posts, newest first as listed in the feed",
+    )
+    add_http_arguments(parser)
+
+
+def batch_selection(args: argparse.Namespace) -> Optional[BatchSelection]:
+    """Return the batch selection the arguments ask for, or None for an interactive run."""
+    if not (args.all or args.since or args.match or args.limit is not None):
+        return None
+    return BatchSelection(since=args.since, pattern=args.match, limit=args.limit)
 
 
 def main() -> None:
@@ -193,6 +454,7 @@ def main() -> None:
         default=DEFAULT_MEDIUM_FEED,
         help=f"Medium feed URL (default: {DEFAULT_MEDIUM_FEED})",
     )
+    add_sync_arguments(medium_parser)
 
     devto_parser = subparsers.add_parser(
         "devto", help="Fetch posts from Dev.to")
@@ -201,6 +463,7 @@ def main() -> None:
         default=DEFAULT_DEVTO_FEED,
         help=f"Dev.to feed URL (default: {DEFAULT_DEVTO_FEED})",
     )
+    add_sync_arguments(devto_parser)
 
     args = parser.parse_args()
 
@@ -208,11 +471,14 @@ def main() -> None:
         parser.print_help()
         return
 
-    if args.source == "medium":
-        from .fetch_medium import fetch_medium_posts
-
-        run(fetch_medium_posts, args.feed_url)
-    elif args.source == "devto":
-        from .fetch_devto import fetch_devto_posts
+    apply_http_arguments(args)
 
-        run(fetch_devto_posts, args.feed_url)
+    if args.source == "medium":
+        from .fetch_medium import fetch_medium_posts as feed_fetcher
+    else:
+        from .fetch_devto import fetch_devto_posts as feed_fetcher
+
+    ok = run(feed_fetcher, args.feed_url, rebuild=args.rebuild,
+             include_imported=args.include_imported, batch=batch_selection(args))
+    if not ok:
+        sys.exit(1)
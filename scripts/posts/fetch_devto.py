@@ -1,21 +1,30 @@
 """Dev.to-specific post fetching logic."""
 
-from typing import List, Optional
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
 from urllib.parse import urlsplit
 
-import feedparser
-import requests
-from rich.console import Console
-from rich.theme import Theme
+from common.feeds import parse_feed
+from common.http_client import get_client
+from common.manifest import SyncManifest
 
 from .blog_post import BlogPost
-from .cli import clean_url, parse_publish_date, slugify
-
-console = Console(theme=Theme(
-    {"prompt": "bold cyan", "choice": "bold green", "error": "bold red"}))
+from .cli import ImportedPosts, clean_url, console, entry_source, parse_publish_date, slugify
 
 DEVTO_SKIP_SLUGS = {"building-a-chess-game-with-python-and-openai-3knn"}
 
+DEVTO_URL = os.environ.get("DEVTO_URL", "https://dev.to").rstrip("/")
+
+T = TypeVar("T")
+
+# How many posts ahead of the prompt to fetch article details for; 0 fetches
+# them only once a post is chosen
+PREFETCH_AHEAD = int(os.environ.get("DEVTO_PREFETCH_AHEAD", "2"))
+
 
 def extract_devto_article_id(url: str) -> Optional[str]:
     """Extract the article path (username/slug) from a Dev.to URL."""
@@ -33,8 +42,8 @@ def extract_devto_article_id(url: str) -> Optional[str]:
 
 def fetch_devto_article(article_id: str) -> dict:
     """Fetch article data from the Dev.to API."""
-    api_url = f"https://dev.to/api/articles/{article_id}"
-    response = requests.get(api_url, timeout=30)
+    api_url = f"{DEVTO_URL}/api/articles/{article_id}"
+    response = get_client().get(api_url, timeout=30)
     response.raise_for_status()
     return response.json()
 
@@ -42,8 +51,8 @@ def fetch_devto_article(article_id: str) -> dict:
 def fetch_series_title(username: str, collection_id: int) -> Optional[str]:
     """Fetch series title from the Dev.to series page."""
     try:
-        series_url = f"https://dev.to/{username}/series/{collection_id}"
-        response = requests.get(series_url, timeout=30)
+        series_url = f"{DEVTO_URL}/{username}/series/{collection_id}"
+        response = get_client().get(series_url, timeout=30)
         response.raise_for_status()
 
         # Extract title from HTML <title> tag
@@ -63,30 +72,89 @@ def fetch_series_title(username: str, collection_id: int) -> Optional[str]:
     return None
 
 
-def calculate_series_order(username: str, collection_id: int, article_id: int) -> Optional[int]:
-    """Calculate the article's position in the series based on publish date."""
-    try:
-        # Fetch all articles for the user
-        api_url = f"https://dev.to/api/articles?username={username}&per_page=1000"
-        response = requests.get(api_url, timeout=30)
-        response.raise_for_status()
-        articles = response.json()
-
-        # Filter articles by collection_id and sort by published_at
-        series_articles = [
-            a for a in articles
-            if a.get("collection_id") == collection_id
-        ]
-        series_articles.sort(key=lambda x: x.get("published_at", ""))
-
-        # Find the position of the current article
-        for index, article in enumerate(series_articles, start=1):
-            if article.get("id") == article_id:
-                return index
-    except Exception:
-        # If we can't determine order, return None
-        pass
-    return None
+def fetch_user_series(username: str) -> Dict[int, List[int]]:
+    """Fetch all of a user's articles once and group them into series.
+
+    Returns:
+        Dict[int, List[int]]: article ids in publish order, keyed by collection_id
+    """
+    api_url = f"{DEVTO_URL}/api/articles?username={username}&per_page=1000"
+    response = get_client().get(api_url, timeout=30)
+    response.raise_for_status()
+
+    series_articles: Dict[int, List[dict]] = {}
+    for article in response.json():
+        collection_id = article.get("collection_id")
+        if collection_id:
+            series_articles.setdefault(collection_id, []).append(article)
+
+    return {
+        collection_id: [article.get("id") for article in sorted(
+            articles, key=lambda x: x.get("published_at", ""))]
+        for collection_id, articles in series_articles.items()
+    }
+
+
+@dataclass
+class Series:
+    """A Dev.to series: its articles in publish order and its title."""
+    article_ids: List[int]
+    title: Optional[str] = None
+
+    def position(self, article_id: int) -> Optional[int]:
+        """Return the 1-based position of an article in the series."""
+        if article_id in self.article_ids:
+            return self.article_ids.index(article_id) + 1
+        return None
+
+
+class SeriesIndex:
+    """Series of each Dev.to user, looked up once per run.
+
+    A user's article list is fetched the first time one of their series is
+    needed, and each series page is scraped for its title only once, so
+    every part of a series is served from the same lookups. The lock only
+    guards the table of lookups; requests run outside it, so workers needing
+    different series don't wait on each other.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._lookups: Dict[tuple, Future] = {}
+
+    def _once(self, key: tuple, lookup: Callable[[], T]) -> T:
+        """Run lookup for key the first time it is asked for; later callers wait for its result."""
+        with self._lock:
+            future = self._lookups.get(key)
+            first = future is None
+            if first:
+                future = self._lookups[key] = Future()
+        if first:
+            try:
+                future.set_result(lookup())
+            except BaseException as err:
+                future.set_exception(err)
+        return future.result()
+
+    def user_series(self, username: str) -> Dict[int, List[int]]:
+        def lookup() -> Dict[int, List[int]]:
+            try:
+                return fetch_user_series(username)
+            except Exception:
+                # If we can't list the articles, there is no order to give
+                return {}
+
+        return self._once(("user", username), lookup)
+
+    def get(self, username: str, collection_id: int) -> Series:
+        """Return the series; it has no articles if the user's articles can't be listed."""
+        return self._once(("series", username, collection_id), lambda: Series(
+            article_ids=self.user_series(username).get(collection_id) or [],
+            title=fetch_series_title(username, collection_id),
+        ))
+
+
+series_index = SeriesIndex()
 
 
 def extract_devto_slug(entry) -> Optional[str]:
@@ -120,15 +188,33 @@ def extract_tags(entry) -> List[str]:
     return tags
 
 
-def fetch_devto_posts(feed_url: str) -> List[BlogPost]:
-    """Fetch Dev.to posts using the RSS feed."""
-    parsed = feedparser.parse(feed_url)
+def fetch_devto_posts(
+    feed_url: str,
+    manifest: Optional[SyncManifest] = None,
+    imported: Optional[ImportedPosts] = None,
+) -> Iterator[BlogPost]:
+    """Fetch Dev.to posts using the RSS feed.
+
+    Posts are yielded one at a time with only their feed metadata; article
+    details are fetched from the API for the next few posts in the
+    background and otherwise once a post is chosen. Entries recorded in
+    manifest with the same content are skipped, as are posts already in imported.
+    """
+    parsed = parse_feed(feed_url)
     if parsed.bozo:
         raise ValueError(
             f"Failed to parse Dev.to feed: {parsed.bozo_exception}")
+    return prefetch_details(devto_posts(parsed.entries, manifest, imported))
+
 
-    posts: List[BlogPost] = []
-    for entry in parsed.entries:
+def devto_posts(
+    entries: list,
+    manifest: Optional[SyncManifest],
+    imported: Optional[ImportedPosts] = None,
+) -> Iterator[Tuple[BlogPost, str]]:
+    """Yield each importable entry as a BlogPost, with its API article id."""
+    unchanged = already = 0
+    for entry in entries:
         title = entry.get("title")
         if not title:
             console.print("Skipping entry without a title.", style="error")
@@ -136,16 +222,77 @@ def fetch_devto_posts(feed_url: str) -> List[BlogPost]:
         entry_slug = extract_devto_slug(entry)
         if entry_slug and entry_slug in DEVTO_SKIP_SLUGS:
             continue
+        source_url, digest = entry_source(entry)
+        if manifest and source_url and manifest.is_unchanged(source_url, digest):
+            unchanged += 1
+            continue
         try:
-            posts.append(parse_devto_entry(entry))
+            post, article_id = parse_devto_entry(entry)
         except ValueError as err:
             console.print(
                 f"Skipping Dev.to entry '{title}': {err}", style="error")
-    return posts
-
-
-def parse_devto_entry(entry) -> BlogPost:
-    """Transform a Dev.to feed entry into a BlogPost using the Dev.to API."""
+            continue
+        post.source_url, post.entry_digest = source_url, digest
+        if imported and imported.has(post):
+            already += 1
+            continue
+        yield post, article_id
+    if unchanged:
+        console.print(
+            f"Skipped {unchanged} posts unchanged since they were imported.", style="choice")
+    if already:
+        console.print(
+            f"Skipped {already} posts already in content/writing.", style="choice")
+
+
+def prefetch_details(posts: Iterator[Tuple[BlogPost, str]]) -> Iterator[BlogPost]:
+    """Fetch article details PREFETCH_AHEAD posts ahead of the consumer.
+
+    Lookups that haven't started are cancelled once the consumer stops
+    iterating.
+    """
+    if PREFETCH_AHEAD <= 0:
+        yield from (post for post, _ in posts)
+        return
+
+    executor = ThreadPoolExecutor(
+        max_workers=PREFETCH_AHEAD, thread_name_prefix="devto-prefetch")
+    window: Deque[BlogPost] = deque()
+    try:
+        for post, article_id in posts:
+            future = executor.submit(fetch_article_details, article_id)
+            post.loader = prefetched_loader(future, article_id)
+            window.append(post)
+            if len(window) > PREFETCH_AHEAD:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def prefetched_loader(future: Future, article_id: str):
+    """Return a loader that applies details fetched in the background.
+
+    A lookup still waiting for a prefetch worker is cancelled and done in
+    the calling thread instead, so loading many posts at once is not
+    limited to PREFETCH_AHEAD requests at a time.
+    """
+    def load(post: BlogPost) -> None:
+        if future.cancel():
+            details = fetch_article_details(article_id)
+        else:
+            details = future.result()
+        apply_article_details(post, details)
+    return load
+
+
+def parse_devto_entry(entry) -> Tuple[BlogPost, str]:
+    """Transform a Dev.to feed entry into a BlogPost that loads its article on demand.
+
+    Returns:
+        Tuple[BlogPost, str]: the post and its Dev.to API article id
+    """
     title: str = entry.title
     slug = slugify(title)
 
@@ -161,22 +308,55 @@ def parse_devto_entry(entry) -> BlogPost:
     if not article_id:
         raise ValueError("Could not extract article ID from Dev.to URL.")
 
+    post = BlogPost(
+        title=title,
+        slug=slug,
+        date=published,
+        original_url=original_url,
+        tags=extract_tags(entry),
+    )
+
+    # The feed thumbnail is the fallback if the article has no cover image
+    thumbnails = entry.get("media_thumbnail")
+    if thumbnails and isinstance(thumbnails, list):
+        thumb = thumbnails[0]
+        if isinstance(thumb, dict) and thumb.get("url"):
+            post.image_url = thumb["url"]
+            post.image_alt = thumb.get("title", "")
+
+    post.loader = lambda post: apply_article_details(
+        post, fetch_article_details(article_id))
+    return post, article_id
+
+
+def fetch_article_details(article_id: str) -> dict:
+    """Fetch an article from the Dev.to API, with its series title and position."""
     api_data = fetch_devto_article(article_id)
+
+    # Extract series information if article is part of a series
+    collection_id = api_data.get("collection_id")
+    if collection_id:
+        # Extract username from article_id (format: "username/slug")
+        username = article_id.split("/")[0] if "/" in article_id else None
+        if username:
+            series = series_index.get(username, collection_id)
+            api_data["series_title"] = series.title
+            article_numeric_id = api_data.get("id")
+            if article_numeric_id:
+                api_data["series_order"] = series.position(article_numeric_id)
+    return api_data
+
+
+def apply_article_details(post: BlogPost, api_data: dict) -> None:
+    """Fill in a post's body, cover image, tags and series from the Dev.to API."""
     markdown_body = api_data.get("body_markdown", "").strip()
     if not markdown_body:
         raise ValueError("Article does not contain markdown content.")
+    post.markdown_body = markdown_body
 
-    image_url = api_data.get("cover_image")
-    image_alt = api_data.get("title", "")
-
-    # Fallback to feed thumbnail if no cover image
-    if not image_url:
-        thumbnails = entry.get("media_thumbnail")
-        if thumbnails and isinstance(thumbnails, list):
-            thumb = thumbnails[0]
-            if isinstance(thumb, dict) and thumb.get("url"):
-                image_url = thumb["url"]
-                image_alt = thumb.get("title", "")
+    if api_data.get("cover_image"):
+        post.image_url = api_data["cover_image"]
+        post.image_alt = api_data.get("title", "")
 
     tag_list = api_data.get("tag_list", [])
     # Handle both list and comma-separated string formats from API
@@ -186,31 +366,8 @@ def parse_devto_entry(entry) -> BlogPost:
         tags = [str(tag).strip() for tag in tag_list if tag]
     else:
         tags = []
+    if tags:
+        post.tags = tags
 
-    # Extract series information if article is part of a series
-    series_title = None
-    series_order = None
-    collection_id = api_data.get("collection_id")
-    if collection_id:
-        # Extract username from article_id (format: "username/slug")
-        username = article_id.split("/")[0] if "/" in article_id else None
-        if username:
-            series_title = fetch_series_title(username, collection_id)
-            article_numeric_id = api_data.get("id")
-            if article_numeric_id:
-                series_order = calculate_series_order(
-                    username, collection_id, article_numeric_id
-                )
-
-    return BlogPost(
-        title=title,
-        slug=slug,
-        date=published,
-        original_url=original_url,
-        markdown_body=markdown_body,
-        tags=tags if tags else extract_tags(entry),
-        image_url=image_url,
-        image_alt=image_alt,
-        series_title=series_title,
-        series_order=series_order,
-    )
+    post.series_title = api_data.get("series_title")
+    post.series_order = api_data.get("series_order")
@@ -1,22 +1,29 @@
 """Medium-specific post fetching logic."""
 
+import multiprocessing
+import os
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 from urllib.parse import urlsplit, urlunsplit
 
-import feedparser
-from bs4 import BeautifulSoup
-from markdownify import markdownify as html_to_markdown
-from rich.console import Console
-from rich.theme import Theme
+from bs4 import BeautifulSoup, Tag
+from markdownify import MarkdownConverter
 
-from .blog_post import BlogPost
-from .cli import clean_url, parse_publish_date, slugify
+try:
+    import lxml  # noqa: F401
+    DEFAULT_HTML_PARSER = "lxml"
+except ImportError:
+    DEFAULT_HTML_PARSER = "html.parser"
+
+from common.feeds import parse_feed
+from common.manifest import SyncManifest
 
-console = Console(theme=Theme(
-    {"prompt": "bold cyan", "choice": "bold green", "error": "bold red"}))
+from .blog_post import BlogPost
+from .cli import ImportedPosts, clean_url, console, entry_source, parse_publish_date, slugify
 
 ORIGINAL_LINE_PATTERN = re.compile(r"Originally published at", re.IGNORECASE)
 ORIGINAL_DATE_PATTERN = re.compile(
@@ -24,61 +31,100 @@ ORIGINAL_DATE_PATTERN = re.compile(
 TRACKING_IMAGE_PATTERNS = [
     re.compile(r"medium\.com/_/stat", re.IGNORECASE),
 ]
+ORIGINAL_LINE_TAGS = {"p", "div", "section"}
+# Checked against the raw HTML: without this word there is no "Originally
+# published at" line and the body is not parsed until it is converted
+ORIGINAL_MARKER = "originally"
+HEADING_LEVELS = {f"h{level}": level for level in range(1, 7)}
+
+# lxml is used when installed, as it parses faster than the built-in parser;
+# MEDIUM_HTML_PARSER picks a BeautifulSoup parser explicitly
+HTML_PARSER = os.environ.get("MEDIUM_HTML_PARSER", DEFAULT_HTML_PARSER)
+
+# Processes converting posts that are loaded at the same time, as in batch
+# mode; 0 or 1 converts everything in the calling thread
+CONVERT_WORKERS = int(os.environ.get(
+    "MEDIUM_CONVERT_WORKERS", str(min(os.cpu_count() or 1, 4))))
 
 
-def normalize_headings(soup: BeautifulSoup) -> None:
+def normalize_headings(headings: List[Tuple[int, Tag]]) -> None:
     """Normalize headings so the highest-level heading becomes H2, preserving hierarchy."""
-    heading_nodes: List[Tuple[int, BeautifulSoup]] = []
-    for level in range(1, 7):
-        for heading in soup.find_all(f"h{level}"):
-            heading_nodes.append((level, heading))
-    if not heading_nodes:
+    if not headings:
         return
-    min_level = min(level for level, _ in heading_nodes)
-    offset = 2 - min_level
-    for level, heading in heading_nodes:
-        new_level = level + offset
-        if new_level < 2:
-            new_level = 2
-        elif new_level > 6:
-            new_level = 6
-        heading.name = f"h{new_level}"
-
-
-def pop_first_image(soup: BeautifulSoup) -> Tuple[Optional[str], str]:
-    """Remove and return the first non-tracking image from the article body."""
-    for img in soup.find_all("img"):
-        src = img.get("src")
-        if not src or is_tracking_image(src):
-            img.decompose()
+    offset = 2 - min(level for level, _ in headings)
+    for level, heading in headings:
+        heading.name = f"h{min(max(level + offset, 2), 6)}"
+
+
+def clean_article(soup: BeautifulSoup) -> Tuple[Optional[str], str]:
+    """Pop the cover image, drop tracking images and normalize headings in one pass over the tree.
+
+    Returns:
+        Tuple[Optional[str], str]: the URL and alt text of the first
+        non-tracking image, which is removed from the article
+    """
+    image_url: Optional[str] = None
+    image_alt = ""
+    headings: List[Tuple[int, Tag]] = []
+    for tag in soup.find_all(True):
+        if tag.name == "img":
+            src = tag.get("src")
+            if not src or is_tracking_image(src):
+                tag.decompose()
+            elif image_url is None:
+                image_url, image_alt = src, tag.get("alt", "")
+                tag.decompose()
+        elif tag.name in HEADING_LEVELS:
+            headings.append((HEADING_LEVELS[tag.name], tag))
+    normalize_headings(headings)
+    return image_url, image_alt
+
+
+def has_original_marker(html: str) -> bool:
+    """Return False if the raw HTML cannot contain an "Originally published at" line."""
+    return ORIGINAL_MARKER in html.lower()
+
+
+def find_original_line(soup: BeautifulSoup) -> Optional[Tuple[Tag, str]]:
+    """Find the outermost p, div or section whose text has the "Originally published at" line.
+
+    An element whose text does not match cannot contain a matching one, so
+    its subtree is skipped and every element's text is read at most once.
+
+    Returns:
+        Optional[Tuple[Tag, str]]: the element and its text
+    """
+    stack = [child for child in reversed(soup.contents) if isinstance(child, Tag)]
+    while stack:
+        element = stack.pop()
+        if element.name in ORIGINAL_LINE_TAGS:
+            text = element.get_text(separator=" ", strip=True)
+            if text and ORIGINAL_LINE_PATTERN.search(text):
+                return element, text
             continue
-        image_alt = img.get("alt", "")
-        img.decompose()
-        return src, image_alt
-    return None, ""
+        stack.extend(child for child in reversed(element.contents) if isinstance(child, Tag))
+    return None
 
 
 def extract_original_metadata(soup: BeautifulSoup) -> Tuple[Optional[str], Optional[datetime]]:
-    """Extract original publication URL and date from the article body."""
-    for element in soup.find_all(["p", "div", "section"]):
-        text = element.get_text(separator=" ", strip=True)
-        if not text:
-            continue
-        if ORIGINAL_LINE_PATTERN.search(text):
-            anchor = element.find("a", href=True)
-            raw_url = anchor["href"] if anchor else None
-            date_match = ORIGINAL_DATE_PATTERN.search(text)
-            parsed_date: Optional[datetime] = None
-            if date_match:
-                date_str = date_match.group(1)
-                try:
-                    parsed_date = datetime.strptime(
-                        date_str, "%B %d, %Y").replace(tzinfo=timezone.utc)
-                except ValueError:
-                    parsed_date = None
-            element.decompose()
-            return clean_url(raw_url) if raw_url else None, parsed_date
-    return None, None
+    """Extract original publication URL and date from the article body, removing the line."""
+    found = find_original_line(soup)
+    if not found:
+        return None, None
+    element, text = found
+    anchor = element.find("a", href=True)
+    raw_url = anchor["href"] if anchor else None
+    date_match = ORIGINAL_DATE_PATTERN.search(text)
+    parsed_date: Optional[datetime] = None
+    if date_match:
+        date_str = date_match.group(1)
+        try:
+            parsed_date = datetime.strptime(
+                date_str, "%B %d, %Y").replace(tzinfo=timezone.utc)
+        except ValueError:
+            parsed_date = None
+    element.decompose()
+    return clean_url(raw_url) if raw_url else None, parsed_date
 
 
 def is_tracking_image(url: str) -> bool:
@@ -90,14 +136,6 @@ def is_tracking_image(url: str) -> bool:
     return False
 
 
-def remove_tracking_images(soup: BeautifulSoup) -> None:
-    """Strip any remaining tracking images from the article body."""
-    for img in soup.find_all("img"):
-        src = img.get("src")
-        if not src or is_tracking_image(src):
-            img.decompose()
-
-
 def extract_tags(entry) -> List[str]:
     """Extract tag terms from a feed entry."""
     tags: List[str] = []
@@ -115,30 +153,62 @@ def extract_tags(entry) -> List[str]:
     return tags
 
 
-def fetch_medium_posts(feed_url: str) -> List[BlogPost]:
-    """Fetch Medium posts using the RSS feed."""
-    parsed = feedparser.parse(feed_url)
+def fetch_medium_posts(
+    feed_url: str,
+    manifest: Optional[SyncManifest] = None,
+    imported: Optional[ImportedPosts] = None,
+) -> Iterator[BlogPost]:
+    """Fetch Medium posts using the RSS feed.
+
+    Posts are yielded one at a time; their markdown and image are only
+    worked out once a post is chosen. Entries recorded in manifest with the
+    same content are skipped, as are posts already in imported.
+    """
+    parsed = parse_feed(feed_url)
     if parsed.bozo:
         raise ValueError(
             f"Failed to parse Medium feed: {parsed.bozo_exception}")
+    return medium_posts(parsed.entries, manifest, imported)
+
 
-    posts: List[BlogPost] = []
-    for entry in parsed.entries:
+def medium_posts(
+    entries: list,
+    manifest: Optional[SyncManifest],
+    imported: Optional[ImportedPosts] = None,
+) -> Iterator[BlogPost]:
+    """Yield each importable entry as a BlogPost."""
+    unchanged = already = 0
+    for entry in entries:
         title = entry.get("title")
         if not title:
             console.print("Skipping entry without a title.", style="error")
             continue
 
+        source_url, digest = entry_source(entry)
+        if manifest and source_url and manifest.is_unchanged(source_url, digest):
+            unchanged += 1
+            continue
         try:
-            posts.append(parse_medium_entry(entry))
+            post = parse_medium_entry(entry)
         except ValueError as err:
             console.print(
                 f"Skipping Medium entry '{title}': {err}", style="error")
-    return posts
+            continue
+        post.source_url, post.entry_digest = source_url, digest
+        if imported and imported.has(post):
+            already += 1
+            continue
+        yield post
+    if unchanged:
+        console.print(
+            f"Skipped {unchanged} posts unchanged since they were imported.", style="choice")
+    if already:
+        console.print(
+            f"Skipped {already} posts already in content/writing.", style="choice")
 
 
 def parse_medium_entry(entry) -> BlogPost:
-    """Transform a Medium feed entry into a BlogPost."""
+    """Transform a Medium feed entry into a BlogPost that converts its body on demand."""
     title: str = entry.title
     slug = slugify(title)
 
@@ -153,13 +223,10 @@ def parse_medium_entry(entry) -> BlogPost:
     if not content_html:
         raise ValueError("Entry does not contain HTML content.")
 
-    soup = BeautifulSoup(content_html, "html.parser")
-    override_url, override_date = extract_original_metadata(soup)
-    image_url, image_alt = pop_first_image(soup)
-    remove_tracking_images(soup)
-
-    normalize_headings(soup)
-    markdown_body = html_to_markdown(str(soup), heading_style="ATX").strip()
+    override_url, override_date = None, None
+    if has_original_marker(content_html):
+        soup = BeautifulSoup(content_html, HTML_PARSER)
+        override_url, override_date = extract_original_metadata(soup)
 
     original_url = override_url or entry.get("link")
     if not original_url:
@@ -169,13 +236,73 @@ def parse_medium_entry(entry) -> BlogPost:
     if override_date:
         published = override_date
 
-    return BlogPost(
+    post = BlogPost(
         title=title,
         slug=slug,
         date=published,
         original_url=original_url,
-        markdown_body=markdown_body,
         tags=extract_tags(entry),
-        image_url=image_url,
-        image_alt=image_alt,
     )
+    post.loader = lambda post: apply_conversion(post, converter.convert(content_html))
+    return post
+
+
+def apply_conversion(post: BlogPost, conversion: Tuple[Optional[str], str, str]) -> None:
+    """Set the image and markdown returned by convert_medium_html on post."""
+    post.image_url, post.image_alt, post.markdown_body = conversion
+
+
+def convert_medium_html(content_html: str) -> Tuple[Optional[str], str, str]:
+    """Convert a Medium article to markdown.
+
+    The "Originally published at" line is dropped, and the cover image is
+    pulled out of the article.
+
+    Returns:
+        Tuple[Optional[str], str, str]: the cover image URL and alt text, and the markdown body
+    """
+    soup = BeautifulSoup(content_html, HTML_PARSER)
+    if has_original_marker(content_html):
+        extract_original_metadata(soup)
+    image_url, image_alt = clean_article(soup)
+    markdown = MarkdownConverter(heading_style="ATX").convert_soup(soup).strip()
+    return image_url, image_alt, markdown
+
+
+class MediumConverter:
+    """Runs conversions in the calling thread, or in worker processes when several overlap.
+
+    The first conversion in flight always runs in its caller, so loading one
+    post at a time never starts the process pool.
+    """
+
+    def __init__(self, workers: int = CONVERT_WORKERS) -> None:
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._active = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _acquire_pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            self._active += 1
+            if self._active == 1 or self.workers <= 1:
+                return None
+            if self._pool is None:
+                # Started from worker threads, so the workers are spawned:
+                # a forked child could inherit a lock another thread holds
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def convert(self, content_html: str) -> Tuple[Optional[str], str, str]:
+        pool = self._acquire_pool()
+        try:
+            if pool is None:
+                return convert_medium_html(content_html)
+            return pool.submit(convert_medium_html, content_html).result()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+
+converter = MediumConverter()
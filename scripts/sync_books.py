@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+"""Sync all Goodreads shelves into Hugo content files in one run."""
+
+from books import main
+
+
+if __name__ == "__main__":
+    main()